@@ -1,12 +1,19 @@
 import json
+import os
 import sys
 import subprocess
 
-from VyPRAnalysis.http_requests import VerdictServerConnection
+from VyPRAnalysis.http_requests import VerdictServerConnection, default_pool_size
+from VyPRAnalysis.local_database import VerdictDatabaseConnection
+from VyPRAnalysis.response_cache import ResponseCache, default_max_size
+from VyPRAnalysis.scfg_cache import SCFGCache
 
 config_dict = None
 server_url = None
 connection = None
+response_cache = ResponseCache()
+scfg_cache = SCFGCache()
+reconstruction_processes = None
 vypr_path = "VyPRAnalysis"
 monitored_service_path = None
 
@@ -22,25 +29,136 @@ def set_config_file(config_file_name='config.json'):
     server_url = config_dict["verdict_server_url"]
     monitored_service_path = config_dict["monitored_service"]
     vypr_path = config_dict["vypr_path"]
+    pool_size = config_dict.get("pool_size", default_pool_size)
+    max_concurrency = config_dict.get("max_concurrency")
 
-    set_server(server_url)
+    set_server(server_url, pool_size, max_concurrency)
     set_vypr_path(vypr_path)
 
 
-def set_server(given_url):
+def set_server(given_url, pool_size=default_pool_size, max_concurrency=None, database_identity=None):
     """
     Set the server for the analysis library to ``given_url`` and then perform a handshake.
+
+    ``pool_size`` is the number of keep-alive connections that are kept open to the server and shared
+    by every request made by the library, including requests made from worker threads.
+
+    ``max_concurrency`` bounds the number of requests that concurrent fetching functions, such as
+    ``get_verdicts_concurrently``, keep in flight at once.  It defaults to ``pool_size``.
+
+    ``database_identity`` identifies the verdict database behind the server.  Cached responses are stored
+    under it, so that the disk tier of the response cache never gives responses from a different database
+    that was served at the same URL.
     """
     global server_url, connection
     server_url = given_url
+    # close the connections held open to any previous server
+    if connection is not None:
+        connection.close()
+    # objects materialised from, and responses given by, the previous server are no longer valid
+    clear_identity_map()
+    if response_cache is not None:
+        response_cache.clear()
     # try to connect
-    connection = VerdictServerConnection(server_url)
+    connection = VerdictServerConnection(server_url, pool_size, max_concurrency, response_cache, database_identity)
     try:
         response = connection.handshake()
     except:
         raise Exception("Failed to connect to server.")
 
 
+def set_database(database_file, create_indices=False):
+    """
+    Read verdicts directly from the verdict database file ``database_file``, rather than through a verdict server.
+
+    No server needs to be running, so this can be used in place of ``prepare``.  The database file is not changed
+    unless ``create_indices`` is True, in which case indices needed for fast lookups are added to it if they are
+    not already there.
+
+    The path condition sequence leading to an observation and the parametric path of a set of observations are
+    computed by the verdict server, so ``ObservationCollection.to_paths``, ``to_path_multiset``,
+    ``get_paths_from_observations``, ``get_intersection_from_observations``, ``get_parametric_path`` and
+    ``Observation.reconstruct_reaching_path`` raise ``NotImplementedError`` with a database file.  The paths of
+    whole function calls, from ``FunctionCall.reconstruct_path`` and ``PathProfile``, can still be found from
+    a database file.
+    """
+    global server_url, connection
+    server_url = None
+    if connection is not None:
+        connection.close()
+    clear_identity_map()
+    if response_cache is not None:
+        response_cache.clear()
+    connection = VerdictDatabaseConnection(database_file, create_indices)
+    connection.handshake()
+
+
+def set_response_cache(max_size=default_max_size, ttls=None, disk_cache_file=None, enabled=True):
+    """
+    Configure the cache of responses from the verdict server.
+
+    At most ``max_size`` responses are held in memory, with the least recently used discarded first.
+    ``ttls`` is a list of pairs ``(pattern, time to live)``, where the first regular expression matching an end-point
+    determines how many seconds its response is kept for (None for forever, 0 for not at all).
+    If ``disk_cache_file`` is given, responses that are kept forever are also stored in that file for later sessions.
+    If ``enabled`` is False, responses are not cached.
+    """
+    global response_cache, connection
+    if enabled:
+        response_cache = ResponseCache(max_size, ttls, disk_cache_file)
+    else:
+        response_cache = None
+    if type(connection) is VerdictServerConnection:
+        connection.set_cache(response_cache)
+    return response_cache
+
+
+def get_response_cache():
+    """
+    Get the cache of responses from the verdict server, whose ``stats`` method gives its hit and miss counters.
+    """
+    global response_cache
+    return response_cache
+
+
+def set_scfg_cache(directory=None, enabled=True):
+    """
+    Configure the cache of Symbolic Control-Flow Graphs built by ``Function.get_scfg``.
+
+    Graphs are always cached in memory.  If ``directory`` is given, they are also stored in files there, so later
+    sessions can reuse them.  The cache's ``clear`` method only removes the files it stored.  A graph is rebuilt
+    whenever the instrumented file it was built from changes.
+    If ``enabled`` is False, graphs are built every time they are needed.
+    """
+    global scfg_cache
+    scfg_cache = SCFGCache(directory) if enabled else None
+    return scfg_cache
+
+
+def get_scfg_cache():
+    """
+    Get the cache of Symbolic Control-Flow Graphs, whose ``stats`` method gives its hit and miss counters.
+    """
+    global scfg_cache
+    return scfg_cache
+
+
+def set_reconstruction_processes(processes=None):
+    """
+    Set the number of worker processes that reconstruct paths when many are reconstructed at once,
+    for example by ``ObservationCollection.to_paths``.  If ``processes`` is None, paths are reconstructed
+    in the current process.
+    """
+    global reconstruction_processes
+    reconstruction_processes = processes
+    return reconstruction_processes
+
+
+def get_reconstruction_processes():
+    global reconstruction_processes
+    return reconstruction_processes
+
+
 def get_server():
     global server_url
     return server_url
@@ -48,8 +166,8 @@ def get_server():
 
 def get_connection(handshake=False):
     global connection
-    if get_server() is None:
-        raise Exception("No verdict server set.")
+    if connection is None:
+        raise Exception("No verdict server or database set.")
     if handshake:
         # try the handshake - most of the time this will just be done
         # when the server is set initially during configuration
@@ -95,10 +213,12 @@ def prepare(db=None, port=None, logging=False):
         p = subprocess.Popen(cmd, shell=True)
 
 
+    # the server resolves the database file name from inside VyPRServer/
+    database_identity = _database_identity(os.path.join("VyPRServer", db) if db else None)
     handshake_failed = True
     while handshake_failed:
         try:
-            set_server("http://localhost:%d/" % port)
+            set_server("http://localhost:%d/" % port, database_identity=database_identity)
             handshake_failed = False
         except:
             handshake_failed = True
@@ -106,6 +226,21 @@ def prepare(db=None, port=None, logging=False):
     if not handshake_failed: print("Connected to server")
 
 
+def _database_identity(database_file):
+    """
+    Given the name of a verdict database file, or None for the server's default database, give a string that
+    identifies it for the response cache.  The inode is included so that a database recreated under the same
+    name is not mistaken for the old one.
+    """
+    if not database_file:
+        return None
+    database_file = os.path.abspath(database_file)
+    try:
+        return "%s:%i" % (database_file, os.stat(database_file).st_ino)
+    except OSError:
+        return database_file
+
+
 def teardown():
     """
     Shut down the verdict server to which the analysis library is currently pointing.
@@ -113,6 +248,10 @@ def teardown():
     Intended use is at the end of a script that began with ``prepare('...')``.
     """
     global connection
+    if type(connection) is VerdictDatabaseConnection:
+        # there is no server to shut down
+        connection.close()
+        return
     try:
         connection.request("shutdown/")
     except:
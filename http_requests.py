@@ -3,24 +3,158 @@ Module for handling HTTP requests.
 This wraps whatever library we decide to use, so if we change library we can just change it here.
 """
 import requests
+from requests.adapters import HTTPAdapter
+from multiprocessing.pool import ThreadPool
+import itertools
+import threading
+import json
 import os
 
+from VyPRAnalysis.streaming import iter_json_array
+
+# number of keep-alive connections held open to the verdict server
+default_pool_size = 10
+
+# number of bytes read from a streamed response at a time
+stream_chunk_size = 64 * 1024
+
+# records whether the current thread is one of a connection's worker threads
+_worker_state = threading.local()
+
+
+def _mark_worker_thread():
+    _worker_state.is_worker = True
+
+
+def decode_response(text):
+    """
+    Decode the body of a response from the verdict server.  The server responds with ``None`` when there is
+    no row matching a request, which we decode to ``None``.
+    """
+    if text == "None":
+        return None
+    return json.loads(text)
+
 
 class VerdictServerConnection(object):
     """Class to wrap HTTP requests to the verdict server."""
 
-    def __init__(self, verdict_server):
+    def __init__(self, verdict_server, pool_size=default_pool_size, max_concurrency=None, cache=None,
+                 database_identity=None):
         self._verdict_server = verdict_server
+        self._pool_size = pool_size
+        self._cache = cache
+        # responses are cached under their URL along with the identity of the database behind the server, if known,
+        # so responses from a different database served at the same URL are never given
+        self._cache_prefix = "" if database_identity is None else "%s " % database_identity
+        # by default, allow as many requests in flight as there are pooled connections
+        self._max_concurrency = max_concurrency if max_concurrency is not None else pool_size
+        self._worker_pool = None
+        self._worker_pool_lock = threading.Lock()
+        # a single session is shared by every thread, so all requests draw from the same pool of
+        # keep-alive connections.  The underlying urllib3 pool is thread-safe, and blocking when it is
+        # exhausted bounds the number of sockets we hold open to the server.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, self._max_concurrency),
+                              pool_block=True)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def set_cache(self, cache):
+        """Set the ``ResponseCache`` used for responses from the verdict server, or None for no caching."""
+        self._cache = cache
 
     def request(self, end_point):
         """Given an end-point on the verdict server, get the response."""
+        url = os.path.join(self._verdict_server, end_point)
+        if self._cache is not None:
+            body = self._cache.get(self._cache_prefix + url, end_point)
+            if body is not None:
+                return body
+        try:
+            response = self._session.get(url)
+        except:
+            raise Exception("Failed to connect to the verdict server at '%s'." % self._verdict_server)
+        # error pages, such as those given while the server is overloaded, are never cached
+        if self._cache is not None and response.status_code == 200:
+            self._cache.put(self._cache_prefix + url, end_point, response.text)
+        return response.text
+
+    def post(self, end_point, data):
+        """Given an end-point on the verdict server and a request body, post the body and get the response."""
         try:
-            response = requests.get(os.path.join(self._verdict_server, end_point))
+            response = self._session.post(os.path.join(self._verdict_server, end_point), data=data)
             return response.text
         except:
             raise Exception("Failed to connect to the verdict server at '%s'." % self._verdict_server)
 
+    def fetch(self, end_point):
+        """Given an end-point on the verdict server, get the decoded response."""
+        return decode_response(self.request(end_point))
+
+    def fetch_many(self, end_points):
+        """Given a list of end-points on the verdict server, get the decoded responses in the same order."""
+        return self.map(self.fetch, end_points)
+
+    def stream(self, end_point):
+        """
+        Given an end-point on the verdict server that responds with a list, give a generator over the elements
+        of the list.  Elements are decoded as the response arrives, rather than once all of it has been received.
+        Streamed responses are not added to the cache, since they can be arbitrarily large.
+        """
+        url = os.path.join(self._verdict_server, end_point)
+        if self._cache is not None:
+            body = self._cache.get(self._cache_prefix + url, end_point)
+            if body is not None:
+                for element in decode_response(body) or []:
+                    yield element
+                return
+        try:
+            response = self._session.get(url, stream=True)
+        except:
+            raise Exception("Failed to connect to the verdict server at '%s'." % self._verdict_server)
+        try:
+            response.encoding = response.encoding or "utf-8"
+            chunks = response.iter_content(chunk_size=stream_chunk_size, decode_unicode=True)
+            first_chunk = next(chunks, "")
+            if first_chunk == "None":
+                return
+            for element in iter_json_array(itertools.chain([first_chunk], chunks)):
+                yield element
+        finally:
+            response.close()
+
+    def map(self, function, items):
+        """
+        Apply ``function`` to each element of ``items`` using worker threads, so that up to the connection's
+        concurrency limit of requests are in flight at once.  Results are given in the same order as ``items``.
+
+        If ``function`` itself calls ``map``, the inner call runs in the calling worker thread rather than
+        waiting on the (possibly exhausted) worker pool.
+        """
+        items = list(items)
+        if getattr(_worker_state, "is_worker", False) or len(items) < 2:
+            return list(map(function, items))
+        with self._worker_pool_lock:
+            if self._worker_pool is None:
+                self._worker_pool = ThreadPool(self._max_concurrency, initializer=_mark_worker_thread)
+        return self._worker_pool.map(function, items)
+
+    def request_many(self, end_points):
+        """Given a list of end-points on the verdict server, get the responses concurrently, in the same order."""
+        return self.map(self.request, end_points)
+
     def handshake(self):
         """Try to connect to the verdict server.  We might include more information in the response at some point."""
         # request the index page
         self.request(end_point="")
+
+    def close(self):
+        """Close all pooled connections to the verdict server and stop any worker threads."""
+        with self._worker_pool_lock:
+            if self._worker_pool is not None:
+                self._worker_pool.terminate()
+                self._worker_pool = None
+        if self._cache is not None:
+            self._cache.flush()
+        self._session.close()
@@ -0,0 +1,275 @@
+"""
+Module for reading a verdict database directly, without going through a verdict server.
+A VerdictDatabaseConnection answers the same end-points as a VerdictServerConnection, so the ORM can use either.
+"""
+import sqlite3
+import threading
+import json
+import os
+import re
+
+# indices on the foreign keys that the ORM queries by, which the verdict database schema does not create itself
+indices = [
+    ("function", "fully_qualified_name"),
+    ("function_call", "function"),
+    ("function_call", "trans"),
+    ("function_call", "time_of_call"),
+    ("verdict", "function_call"),
+    ("verdict", "binding"),
+    ("observation", "verdict"),
+    ("observation", "instrumentation_point"),
+    ("binding", "function"),
+    ("atom", "property_hash, index_in_atoms"),
+    ("trans", "time_of_transaction"),
+]
+
+
+class Route(object):
+    """
+    Maps an end-point of the verdict server to the SQL query that gives the same rows.
+    ``conditions`` are SQL conditions with one placeholder each, filled by the groups matched in ``pattern``.
+    """
+
+    def __init__(self, pattern, columns, tables, conditions, single=False, order_by=None):
+        self.pattern = re.compile("^%s$" % pattern)
+        self.columns = columns
+        self.tables = tables
+        self.conditions = conditions
+        self.single = single
+        self.order_by = order_by
+
+    def query(self):
+        """Give the SQL query for a single end-point matching this route."""
+        query = "select %s from %s where %s" % (self.columns, self.tables, " and ".join(self.conditions))
+        if self.order_by:
+            query += " order by %s" % self.order_by
+        return query
+
+    def batch_key(self):
+        """
+        If end-points matching this route can be answered together by one query, give the column that
+        distinguishes them.  Otherwise, give None.
+        """
+        if len(self.conditions) == 1 and self.conditions[0].endswith(" = ?"):
+            return self.conditions[0][:-len(" = ?")]
+        return None
+
+    def batch_query(self, n):
+        """Give the SQL query that answers ``n`` end-points matching this route at once."""
+        query = "select %s as _batch_key, %s from %s where %s in (%s)" % \
+                (self.batch_key(), self.columns, self.tables, self.batch_key(), ", ".join(["?"] * n))
+        if self.order_by:
+            query += " order by %s" % self.order_by
+        return query
+
+
+verdicts_with_property = "verdict inner join binding on verdict.binding = binding.id"
+
+routes = [
+    Route(r"client/function/", "*", "function", ["1 = 1"], order_by="id"),
+    Route(r"client/function/id/(\d+)/", "*", "function", ["id = ?"], single=True),
+    Route(r"client/function/name/(.+)/", "*", "function", ["fully_qualified_name = ?"], order_by="id"),
+    Route(r"client/function/id/(\d+)/function_calls/", "*", "function_call", ["function = ?"], order_by="id"),
+    Route(r"client/function/id/(\d+)/bindings/", "*", "binding", ["function = ?"], order_by="id"),
+    Route(r"client/function/id/(\d+)/properties/", "property.*",
+          "property inner join function_property_pair on property.hash = function_property_pair.property_hash",
+          ["function_property_pair.function = ?"]),
+    Route(r"client/property/hash/([^/]+)/", "*", "property", ["hash = ?"], single=True),
+    Route(r"client/binding/id/(\d+)/", "*", "binding", ["id = ?"], single=True),
+    Route(r"client/binding/id/(\d+)/verdicts/", "*", "verdict", ["binding = ?"], order_by="id"),
+    Route(r"client/function_call/id/(\d+)/", "*", "function_call", ["id = ?"], single=True),
+    Route(r"client/function_call/id/(\d+)/verdicts/", "*", "verdict", ["function_call = ?"], order_by="id"),
+    Route(r"client/function_call/id/(\d+)/verdict/value/(\d+)/", "*", "verdict",
+          ["function_call = ?", "verdict = ?"], order_by="id"),
+    Route(r"client/function_call/id/(\d+)/hash/([^/]+)/verdicts/", "verdict.*", verdicts_with_property,
+          ["verdict.function_call = ?", "binding.property_hash = ?"], order_by="verdict.id"),
+    Route(r"client/function_call/id/(\d+)/verdict/value/(\d+)/hash/([^/]+)/", "verdict.*", verdicts_with_property,
+          ["verdict.function_call = ?", "verdict.verdict = ?", "binding.property_hash = ?"],
+          order_by="verdict.id"),
+    Route(r"client/function_call/id/(\d+)/observations/", "observation.*",
+          "observation inner join verdict on observation.verdict = verdict.id",
+          ["verdict.function_call = ?"], order_by="observation.id"),
+    Route(r"client/function_call/between/([^/]+)/([^/]+)/", "*", "function_call",
+          ["time_of_call >= ?", "end_time_of_call <= ?"], order_by="id"),
+    Route(r"client/test_data/", "*", "test_data", ["1 = 1"], order_by="id"),
+    Route(r"client/test_data/id/(\d+)/", "*", "test_data", ["id = ?"], single=True),
+    Route(r"client/verdict/id/(\d+)/", "*", "verdict", ["id = ?"], single=True),
+    Route(r"client/verdict/id/(\d+)/observations/", "*", "observation", ["verdict = ?"], order_by="id"),
+    Route(r"client/transaction/id/(\d+)/", "*", "trans", ["id = ?"], single=True),
+    Route(r"client/transaction/time/([^/]+)/", "*", "trans", ["time_of_transaction = ?"], single=True),
+    Route(r"client/transaction/time/between/([^/]+)/([^/]+)/", "*", "trans",
+          ["time_of_transaction >= ?", "time_of_transaction <= ?"], order_by="id"),
+    Route(r"client/transaction/id/(\d+)/function_calls/", "*", "function_call", ["trans = ?"], order_by="id"),
+    Route(r"client/atom/id/(\d+)/", "*", "atom", ["id = ?"], single=True),
+    Route(r"client/atom/index/(\d+)/property/([^/]+)/", "*", "atom", ["index_in_atoms = ?", "property_hash = ?"],
+          single=True),
+    Route(r"client/instrumentation_point/id/(\d+)/", "*", "instrumentation_point", ["id = ?"], single=True),
+    Route(r"client/instrumentation_point/id/(\d+)/observations/", "*", "observation",
+          ["instrumentation_point = ?"], order_by="id"),
+    Route(r"client/observation/id/(\d+)/", "*", "observation", ["id = ?"], single=True),
+    Route(r"client/observation/id/(\d+)/assignments/", "assignment.*",
+          "assignment inner join observation_assignment_pair "
+          "on assignment.id = observation_assignment_pair.assignment",
+          ["observation_assignment_pair.observation = ?"], order_by="assignment.id"),
+    Route(r"client/assignment/id/(\d+)/", "*", "assignment", ["id = ?"], single=True),
+]
+
+path_condition_structure_pattern = re.compile(r"^client/path_condition_structure/function_call/(\d+)/$")
+
+
+def _parameter(value):
+    return int(value) if value.isdigit() else value
+
+
+class VerdictDatabaseConnection(object):
+    """
+    Class to read rows from a verdict database file directly, in place of requests to a verdict server.
+
+    Each thread opens its own SQLite connection to the database, since SQLite connections cannot be
+    shared between threads.  The database file is only written to if the ``create_indices`` argument is True,
+    in which case the indices the ORM's queries rely on are added to it.
+    """
+
+    def __init__(self, database_file, create_indices=False):
+        if not os.path.isfile(database_file):
+            raise ValueError("No verdict database found at '%s'." % database_file)
+        self._database_file = database_file
+        self._thread_state = threading.local()
+        self._path_condition_structure = None
+        if create_indices:
+            self.create_indices()
+
+    def _connection(self):
+        connection = getattr(self._thread_state, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self._database_file)
+            self._thread_state.connection = connection
+        return connection
+
+    def create_indices(self):
+        """
+        Create the indices that the ORM's queries rely on, if they do not exist.  This is done once per database
+        file, and is skipped if the file is read-only.
+        """
+        connection = self._connection()
+        try:
+            for (table, columns) in indices:
+                connection.execute("create index if not exists vypr_analysis_%s_%s on %s (%s)" %
+                                   (table, columns.replace(", ", "_"), table, columns))
+            connection.commit()
+        except sqlite3.OperationalError:
+            connection.rollback()
+
+    def rows(self, query, parameters=()):
+        """Execute ``query`` and give a generator over the resulting rows, streamed from the cursor."""
+        cursor = self._connection().execute(query, parameters)
+        columns = [column[0] for column in cursor.description]
+        for row in cursor:
+            yield dict(zip(columns, row))
+
+    def _match(self, end_point):
+        for route in routes:
+            match = route.pattern.match(end_point)
+            if match:
+                return (route, [_parameter(group) for group in match.groups()])
+        return (None, None)
+
+    def fetch(self, end_point):
+        """
+        Given an end-point of the verdict server, give the rows that the server would respond with,
+        or None if the end-point refers to a single row that does not exist.
+        """
+        match = path_condition_structure_pattern.match(end_point)
+        if match:
+            return self._get_path_condition_structure(int(match.group(1)))
+        (route, parameters) = self._match(end_point)
+        if route is None:
+            raise NotImplementedError("The end-point '%s' is only available from a verdict server." % end_point)
+        rows = self.rows(route.query(), parameters)
+        if route.single:
+            return next(rows, None)
+        return list(rows)
+
+    def stream(self, end_point):
+        """
+        Given an end-point of the verdict server that responds with a list, give a generator over the rows
+        of the list, read from the database as they are needed.
+        """
+        (route, parameters) = self._match(end_point)
+        if route is None:
+            raise NotImplementedError("The end-point '%s' is only available from a verdict server." % end_point)
+        return self.rows(route.query(), parameters)
+
+    def fetch_many(self, end_points):
+        """
+        Given a list of end-points, give the rows that would be given by ``fetch`` for each one, in the same order.
+        End-points that differ only in the ID they refer to are answered together by a single query.
+        """
+        results = [None] * len(end_points)
+        groups = {}
+        for (n, end_point) in enumerate(end_points):
+            (route, parameters) = self._match(end_point)
+            if route is not None and route.batch_key() is not None:
+                groups.setdefault(id(route), (route, []))[1].append((n, parameters[0]))
+            else:
+                results[n] = self.fetch(end_point)
+        for (route, positions) in groups.values():
+            keys = list(set([key for (n, key) in positions]))
+            rows_by_key = {}
+            # stay within SQLite's limit on the number of parameters in a single query
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                for row in self.rows(route.batch_query(len(chunk)), chunk):
+                    rows_by_key.setdefault(row.pop("_batch_key"), []).append(row)
+            for (n, key) in positions:
+                rows = rows_by_key.get(key, [])
+                if route.single:
+                    results[n] = rows[0] if len(rows) > 0 else None
+                else:
+                    results[n] = list(rows)
+        return results
+
+    def _get_path_condition_structure(self, function_call_id):
+        """
+        Give the serialised conditions in the path condition sequence of the function call with the given ID.
+        """
+        if self._path_condition_structure is None:
+            self._path_condition_structure = dict(
+                (row["id"], row["serialised_condition"])
+                for row in self.rows("select id, serialised_condition from path_condition_structure")
+            )
+        call = next(self.rows("select path_condition_id_sequence from function_call where id = ?",
+                              (function_call_id,)), None)
+        if call is None:
+            return None
+        return [self._path_condition_structure[condition_id]
+                for condition_id in json.loads(call["path_condition_id_sequence"])]
+
+    def request(self, end_point):
+        """Given an end-point, give the response that a verdict server would give, as JSON."""
+        result = self.fetch(end_point)
+        return "None" if result is None else json.dumps(result)
+
+    def post(self, end_point, data):
+        raise NotImplementedError("The end-point '%s' is only available from a verdict server." % end_point)
+
+    def map(self, function, items):
+        """
+        Apply ``function`` to each element of ``items``.  Reading from a local file gains nothing from
+        concurrency, so this is done in the calling thread.
+        """
+        return list(map(function, items))
+
+    def request_many(self, end_points):
+        return [self.request(end_point) for end_point in end_points]
+
+    def handshake(self):
+        """Check that the database can be read."""
+        next(self.rows("select 1"))
+
+    def close(self):
+        """Close the current thread's connection to the database."""
+        connection = getattr(self._thread_state, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._thread_state.connection = None
@@ -5,3 +5,5 @@ ORM package.
 # VyPRAnalysis imports
 from VyPRAnalysis.orm.base_classes import *
 from VyPRAnalysis.orm.operations import *
+from VyPRAnalysis.orm.frames import *
+from VyPRAnalysis.orm.query import *
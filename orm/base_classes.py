@@ -1,27 +1,303 @@
 """
 **Classes for things VyPR measures**
 """
+from collections import OrderedDict
 import json
 import os
 import ast
 import pickle
 import base64
+import threading
+import weakref
+import multiprocessing
 
 # VyPRAnalysis imports
-from VyPRAnalysis import get_connection, get_monitored_service_path
+from VyPRAnalysis import get_connection, get_monitored_service_path, get_scfg_cache
+from VyPRAnalysis.scfg_cache import module_cache
 from VyPRAnalysis.utils import get_qualifier_subsequence
 from VyPRAnalysis.path_reconstruction import edges_from_condition_sequence, deserialise_condition
+from VyPRAnalysis.orm.frames import VerdictFrame, ObservationFrame
+from VyPRAnalysis.streaming import prefetch_pages, default_page_size
 
 # VyPR imports
 from VyPR.SCFG.construction import *
 
 warnings_on = True
 
-class Function(object):
+# the identity map holds the single instance materialised for each row, keyed by (class, ID).
+# Weak references are used so that rows nothing else refers to any more can be garbage collected.
+_identity_map = weakref.WeakValueDictionary()
+_identity_map_lock = threading.Lock()
+
+
+def clear_identity_map():
+    """
+    Forget every object materialised so far, so later lookups give fresh objects.
+    This is done whenever the verdict server or database changes.
+    """
+    with _identity_map_lock:
+        _identity_map.clear()
+
+
+def _identity_lookup(cls, key):
+    """Give the instance of ``cls`` held in the identity map for ``key``, or None if there isn't one."""
+    if key is None:
+        return None
+    return _identity_map.get((cls, key))
+
+
+class IdentityMapped(type):
+    """
+    Metaclass for ORM classes whose instances are held in the identity map.  Constructing an instance for a row
+    that has already been materialised gives the existing instance without repeating any requests.
+    """
+
+    def __call__(cls, *args, **kwargs):
+        attribute = cls._identity_attribute
+        key = args[0] if len(args) > 0 else kwargs.get(attribute)
+        existing = _identity_lookup(cls, key)
+        if existing is not None:
+            return existing
+        instance = type.__call__(cls, *args, **kwargs)
+        with _identity_map_lock:
+            # the instance may have been materialised concurrently, or looked up by something other than its key
+            return _identity_map.setdefault((cls, getattr(instance, attribute)), instance)
+
+
+# base class for ORM classes, written this way to support both Python 2 and 3 metaclass syntax.
+# It declares no slots of its own, so subclasses that declare __slots__ get no per-instance __dict__.
+IdentityMappedObject = IdentityMapped("IdentityMappedObject", (object,),
+                                      {"_identity_attribute": "id", "__slots__": ()})
+
+
+class SlotsPickling(object):
+    """
+    Mixin for ORM classes that store their fields in slots, so their instances can be pickled with every protocol,
+    including the protocols below 2 that can't pickle objects with slots by themselves.  Related objects loaded
+    by ``load_related`` are not pickled, and are requested again when needed.
+    """
+
+    __slots__ = ()
+
+    def __getstate__(self):
+        state = {}
+        for cls in self.__class__.__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                if name in ("_related", "__weakref__") or name in state:
+                    continue
+                try:
+                    state[name] = getattr(self, name)
+                except AttributeError:
+                    pass
+        return state
+
+    def __setstate__(self, state):
+        for (name, value) in state.items():
+            setattr(self, name, value)
+
+
+# if True, objects that can be constructed lazily from just an ID defer loading their other fields
+lazy_loading = False
+
+# lazily constructed objects whose fields have not been loaded yet, keyed by (class, ID)
+_pending_loads = weakref.WeakValueDictionary()
+
+
+def set_lazy_loading(enabled):
+    """
+    Set whether verdicts, transactions, atoms and instrumentation points constructed from just an ID
+    load their remaining fields immediately, or only when one of those fields is first accessed.
+    This can be overridden for a single object with the ``lazy`` argument of its constructor.
+    """
+    global lazy_loading
+    lazy_loading = enabled
+
+
+def load_pending():
+    """
+    Load the fields of every lazily constructed object that has not yet been loaded,
+    with a single batch of requests for each class.
+    """
+    with _identity_map_lock:
+        pending = list(_pending_loads.values())
+    objects_by_class = {}
+    for obj in pending:
+        objects_by_class.setdefault(obj.__class__, []).append(obj)
+    connection = get_connection()
+    for (cls, objects) in objects_by_class.items():
+        rows = connection.fetch_many([cls._end_point % obj.id for obj in objects])
+        for (obj, row) in zip(objects, rows):
+            obj._load(row)
+
+
+class LazyObject(IdentityMappedObject):
+    """
+    Base class for ORM classes that can be constructed lazily from just an ID.  The fields in ``_lazy_fields``
+    are then loaded from ``_end_point`` when one of them is first accessed, or by ``load_pending``.
+    """
+
+    __slots__ = ()
+    _end_point = None
+    _lazy_fields = ()
+    _missing_message = None
+
+    def _load_or_defer(self, lazy):
+        if lazy or (lazy is None and lazy_loading):
+            with _identity_map_lock:
+                _pending_loads[(self.__class__, self.id)] = self
+        else:
+            self._load(get_connection().fetch(self._end_point % self.id))
+
+    def _load(self, row):
+        if row is None: raise ValueError(self._missing_message)
+        for field in self._lazy_fields:
+            setattr(self, field, row[field])
+        with _identity_map_lock:
+            _pending_loads.pop((self.__class__, self.id), None)
+
+    def __getattr__(self, name):
+        # this is only called for attributes that haven't been set, which for a lazy field means it isn't loaded
+        if name in self._lazy_fields:
+            self._load(get_connection().fetch(self._end_point % self.id))
+            return getattr(self, name)
+        raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+
+
+def _objects_by_ids(cls, end_point, ids, kind, construct):
+    """
+    Give the instances of ``cls`` with each ID in ``ids``, in the same order.  Rows not already in the identity
+    map are requested in a single batch from ``end_point`` and built with ``construct``.
+    """
+    objects = dict((id, _identity_lookup(cls, id)) for id in ids)
+    missing = [id for id in objects if objects[id] is None]
+    for (id, row) in zip(missing, _request_by_ids(end_point, missing, kind)):
+        objects[id] = construct(id, row)
+    return [objects[id] for id in ids]
+
+
+def _request_by_ids(end_point, ids, kind):
+    """
+    Given an end-point with a placeholder for an ID, request the end-point for every ID in ``ids`` in a single
+    batch and give the decoded rows in the same order as ``ids``.
+    """
+    connection = get_connection()
+    results = connection.fetch_many([end_point % id for id in ids])
+    rows = []
+    for (id, result) in zip(ids, results):
+        if result is None: raise ValueError('no %s with ID %i' % (kind, id))
+        rows.append(result)
+    return rows
+
+
+def _function_call_from_row(d):
+    return FunctionCall(id=d["id"], function=d["function"], time_of_call=d["time_of_call"],
+                        end_time_of_call=d["end_time_of_call"], trans=d["trans"],
+                        path_condition_id_sequence=d["path_condition_id_sequence"])
+
+
+def _verdict_from_row(d):
+    return Verdict(id=d["id"], binding=d["binding"], verdict=d["verdict"], time_obtained=d["time_obtained"],
+                   function_call=d["function_call"], collapsing_atom=d["collapsing_atom"],
+                   collapsing_atom_sub_index=d["collapsing_atom_sub_index"])
+
+
+def _observation_from_row(d):
+    return Observation(id=d["id"], instrumentation_point=d["instrumentation_point"], verdict=d["verdict"],
+                       observed_value=d["observed_value"], observation_time=d["observation_time"],
+                       observation_end_time=d["observation_end_time"], atom_index=d["atom_index"],
+                       sub_index=d["sub_index"], previous_condition_offset=d["previous_condition_offset"])
+
+
+def _assignment_from_row(d):
+    # if the row doesn't hold the assignment itself, the assignment is fetched by its ID
+    return Assignment(d["id"], d.get("variable"), d.get("value"), d.get("type"))
+
+
+def _preloaded(obj, relation):
+    """
+    Give the objects related to ``obj`` by ``relation`` if they have been loaded by ``load_related``,
+    otherwise None.
+    """
+    related = getattr(obj, "_related", None)
+    return None if related is None else related.get(relation)
+
+
+def _related_objects(obj, relation):
+    """
+    Give the objects related to ``obj`` by ``relation``, using those loaded by ``load_related`` if there are any.
+    """
+    preloaded = _preloaded(obj, relation)
+    if preloaded is not None:
+        return list(preloaded)
+    (end_point, construct) = obj._relations[relation]
+    return [construct(row) for row in get_connection().fetch(end_point % obj.id)]
+
+
+def _iter_objects(end_point, construct, page_size=default_page_size, prefetch=True):
+    """
+    Give a generator over the objects built with ``construct`` from the rows ``end_point`` responds with.
+    Rows are streamed rather than fetched all at once and, if ``prefetch`` is True, read in pages of
+    ``page_size`` rows in the background while the caller processes the current page.
+    """
+    rows = get_connection().stream(end_point)
+    if prefetch:
+        rows = prefetch_pages(rows, page_size)
+    for row in rows:
+        yield construct(row)
+
+
+def _iter_related(obj, relation, page_size, prefetch):
+    (end_point, construct) = obj._relations[relation]
+    return _iter_objects(end_point % obj.id, construct, page_size, prefetch)
+
+
+def load_related(objects, include):
+    """
+    Load the objects related to each of ``objects`` by the relationships named in ``include``, so that later
+    calls to the methods giving those objects don't contact the verdict server.
+
+    Nested relationships are separated by dots, so ``["verdicts", "verdicts.observations"]`` loads the verdicts
+    of each function call, and the observations of each of those verdicts.  Each relationship is loaded for
+    every object at once, so the number of batches of requests depends only on the depth of ``include``.
+    """
+    if not include:
+        return
+    tree = {}
+    for path in include:
+        node = tree
+        for relation in path.split("."):
+            node = node.setdefault(relation, {})
+    _load_related_tree(objects, tree)
+
+
+def _load_related_tree(objects, tree):
+    # objects can be reached more than once through different parents, so only load each one once
+    unique_objects = dict(((obj.__class__, obj.id), obj) for obj in objects).values()
+    connection = get_connection()
+    for (relation, subtree) in tree.items():
+        related = []
+        parents = [obj for obj in unique_objects if relation in getattr(obj, "_relations", {})]
+        if len(parents) < len(unique_objects):
+            raise ValueError("cannot include '%s' for the objects given" % relation)
+        results = connection.fetch_many([obj._relations[relation][0] % obj.id for obj in parents])
+        for (obj, rows) in zip(parents, results):
+            construct = obj._relations[relation][1]
+            children = [construct(row) for row in rows]
+            if getattr(obj, "_related", None) is None:
+                obj._related = {}
+            obj._related[relation] = children
+            related += children
+        if subtree:
+            _load_related_tree(related, subtree)
+
+
+class Function(IdentityMappedObject):
     """
     Class for functions.  Each monitored function generates its own instance.
     """
 
+    _relations = {"calls": ('client/function/id/%d/function_calls/', _function_call_from_row)}
+
     def __init__(self, id, fully_qualified_name):
         self.id = id
         self.fully_qualified_name = fully_qualified_name
@@ -34,60 +310,40 @@ class Function(object):
                    self.fully_qualified_name
                )
 
-    def get_calls(self):
+    def get_calls(self, include=None):
         """
         Get a list of calls for the current function.
+        ``include`` names relationships of the calls to load at the same time, as for ``load_related``.
         """
-        connection = get_connection()
-        result = connection.request('client/function/id/%s/function_calls/' % self.id)
-        if (result == "[]"):
+        calls_list = _related_objects(self, "calls")
+        if calls_list == []:
             if warnings_on: print('No such calls')
             return []
-        calls_dict = json.loads(result)
-        calls_list = []
-        for call in calls_dict:
-            call_class = FunctionCall(call["id"], call["function"], call["time_of_call"], call["end_time_of_call"],
-                                      call["trans"], call["path_condition_id_sequence"])
-            calls_list.append(call_class)
+        load_related(calls_list, include)
         return calls_list
 
+    def iter_calls(self, page_size=default_page_size, prefetch=True):
+        """
+        Get a generator over the calls of the current function, streamed rather than loaded all at once.
+        If ``prefetch`` is True, calls are read in pages of ``page_size`` in the background.
+        """
+        return _iter_related(self, "calls", page_size, prefetch)
+
     def get_scfg(self):
         """
         Construct the Symbolic Control-Flow Graph of the current function.
+        The graph is cached, and only constructed again once the instrumented file containing the function changes.
         """
-        func = self.fully_qualified_name
-        # check for a machine name in the function name
-        # TODO: we need to change the syntax for machine names so they're easier to recognise
-        if "-" in func[0:func.index(".")]:
-            func = func[func.index("-")+1:]
-        location = get_monitored_service_path()
-        module = func[0:func.rindex(".")]
-        func = func[func.rindex(".") + 1:]
-        file_name = module.replace(".", "/") + ".py.inst"
-        # extract asts from the code in the file
-        code = "".join(open(os.path.join(location, file_name), "r").readlines())
-        asts = ast.parse(code)
-        qualifier_subsequence = get_qualifier_subsequence(func)
-        func = func.replace(":", ".")
-        function_name = func.split(".")
-        # find the function definition
-        actual_function_name = function_name[-1]
-        hierarchy = function_name[:-1]
-        current_step = asts.body
-        # traverse sub structures
-        for step in hierarchy:
-            current_step = filter(
-                lambda entry: (type(entry) is ast.ClassDef and entry.name == step),
-                current_step
-            )[0]
-        # find the final function definition
-        function_def = list(filter(
-            lambda entry: (type(entry) is ast.FunctionDef and entry.name == actual_function_name),
-            current_step.body if type(current_step) is ast.ClassDef else current_step)
-        )[0]
-        # construct the scfg of the code inside the function
-        scfg = CFG()
-        scfg.process_block(function_def.body)
+        (file_name, func) = _scfg_location(self.fully_qualified_name)
+        cache = get_scfg_cache()
+        fingerprint = module_cache.fingerprint(file_name)
+        if cache is not None:
+            scfg = cache.get(_scfg_cache_key(file_name, func), fingerprint)
+            if scfg is not None:
+                return scfg
+        scfg = _build_scfg(module_cache.asts(file_name), func)
+        if cache is not None:
+            cache.put(_scfg_cache_key(file_name, func), fingerprint, scfg)
         return scfg
 
     def get_bindings(self):
@@ -95,11 +351,10 @@ class Function(object):
         Get the list of Binding objects belonging to this function, regardless of their property.
         """
         connection = get_connection()
-        result = connection.request("client/function/id/%d/bindings/" % self.id)
-        if result == "[]":
+        bindings_dict = connection.fetch("client/function/id/%d/bindings/" % self.id)
+        if bindings_dict == []:
             if warnings_on: print ("No such bindings")
             return []
-        bindings_dict = json.loads(result)
         binding_list = []
         for b in bindings_dict:
             binding_obj = binding(b["id"], b["binding_space_index"], b["function"], b["binding_statement_lines"])
@@ -112,11 +367,10 @@ class Function(object):
         Get the list of Property objects for properties that were monitored over the current function.
         """
         connection = get_connection()
-        result = connection.request("client/function/id/%d/properties/" % self.id)
-        if result == "[]":
+        properties_dict = connection.fetch("client/function/id/%d/properties/" % self.id)
+        if properties_dict == []:
             if warnings_on: ("No such properties")
             return []
-        properties_dict = json.loads(result)
         property_list = []
         for prop in properties_dict:
             prop_obj = Property(prop["hash"], prop["serialised_structure"], prop["index_in_specification_file"])
@@ -125,6 +379,108 @@ class Function(object):
         return property_list
 
 
+def _scfg_location(fully_qualified_name):
+    """
+    Give the instrumented file containing the function with the given name, and the qualifier of the function
+    within that file.
+    """
+    func = fully_qualified_name
+    # check for a machine name in the function name
+    # TODO: we need to change the syntax for machine names so they're easier to recognise
+    if "-" in func[0:func.index(".")]:
+        func = func[func.index("-")+1:]
+    location = get_monitored_service_path()
+    module = func[0:func.rindex(".")]
+    func = func[func.rindex(".") + 1:]
+    return (os.path.join(location, module.replace(".", "/") + ".py.inst"), func)
+
+
+def _scfg_cache_key(file_name, func):
+    return "%s:%s" % (os.path.abspath(file_name), func)
+
+
+def _build_scfg(asts, func):
+    """
+    Construct the Symbolic Control-Flow Graph of the function with qualifier ``func`` in the module ``asts``.
+    """
+    func = func.replace(":", ".")
+    function_name = func.split(".")
+    # find the function definition
+    actual_function_name = function_name[-1]
+    hierarchy = function_name[:-1]
+    current_step = asts.body
+    # traverse sub structures
+    for step in hierarchy:
+        current_step = list(filter(
+            lambda entry: (type(entry) is ast.ClassDef and entry.name == step),
+            current_step.body if type(current_step) is ast.ClassDef else current_step
+        ))[0]
+    # find the final function definition
+    function_def = list(filter(
+        lambda entry: (type(entry) is ast.FunctionDef and entry.name == actual_function_name),
+        current_step.body if type(current_step) is ast.ClassDef else current_step)
+    )[0]
+    # construct the scfg of the code inside the function
+    scfg = CFG()
+    scfg.process_block(function_def.body)
+    return scfg
+
+
+def _build_scfgs_in_file(job):
+    # build the graphs of a list of functions in one file, in a worker process
+    (file_name, funcs) = job
+    asts = module_cache.asts(file_name)
+    return [_build_scfg(asts, func) for func in funcs]
+
+
+def build_scfgs(functions, processes=None):
+    """
+    Construct the Symbolic Control-Flow Graphs of every function in ``functions``, giving them in the same order.
+
+    Graphs already in the cache are reused, and each instrumented file is parsed once for all of its functions.
+    If ``processes`` is greater than 1, files are handed out to that many worker processes.
+    """
+    cache = get_scfg_cache()
+    scfgs = [None] * len(functions)
+    # the functions whose graphs need constructing, grouped by the file they are in, each with its fingerprint
+    # and the positions in ``functions`` that it appears at
+    functions_by_file = OrderedDict()
+    for (n, f) in enumerate(functions):
+        (file_name, func) = _scfg_location(f.fully_qualified_name)
+        entries = functions_by_file.get(file_name)
+        if entries is not None and func in entries:
+            # the same function appears more than once, so it's given the same graph everywhere
+            entries[func][1].append(n)
+            continue
+        fingerprint = module_cache.fingerprint(file_name)
+        if cache is not None:
+            scfgs[n] = cache.get(_scfg_cache_key(file_name, func), fingerprint)
+        if scfgs[n] is None:
+            functions_by_file.setdefault(file_name, OrderedDict())[func] = (fingerprint, [n])
+    jobs = [(file_name, list(entries.keys())) for (file_name, entries) in functions_by_file.items()]
+    graphs_by_job = None
+    if processes is not None and processes > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(processes, len(jobs)))
+        try:
+            graphs_by_job = pool.map(_build_scfgs_in_file, jobs)
+        except Exception:
+            # graphs that can't be sent back from a worker process, for example because they are too deeply
+            # nested to pickle, are constructed in this process instead
+            graphs_by_job = None
+        finally:
+            pool.terminate()
+    if graphs_by_job is None:
+        graphs_by_job = [_build_scfgs_in_file(job) for job in jobs]
+    for ((file_name, funcs), graphs) in zip(jobs, graphs_by_job):
+        for (func, scfg) in zip(funcs, graphs):
+            (fingerprint, positions) = functions_by_file[file_name][func]
+            for n in positions:
+                scfgs[n] = scfg
+            if cache is not None:
+                cache.put(_scfg_cache_key(file_name, func), fingerprint, scfg)
+    return scfgs
+
+
 def function(id=None, fully_qualified_name=None):
     """
     Factory function for either getting a single function, or a list of functions, depending on the input.
@@ -141,12 +497,11 @@ def function(id=None, fully_qualified_name=None):
 
     elif fully_qualified_name is not None:
 
-        functions = connection.request('client/function/name/%s/' % fully_qualified_name)
-        if functions == "[]":
+        f_dict = connection.fetch('client/function/name/%s/' % fully_qualified_name)
+        if f_dict == []:
             if warnings_on: print('no functions named %s' % fully_qualified_name)
             return []
 
-        f_dict = json.loads(functions)
         functions_list = []
 
         for f in f_dict:
@@ -157,9 +512,11 @@ def function(id=None, fully_qualified_name=None):
 
     elif id is not None:
 
-        result = connection.request('client/function/id/%d/' % id)
-        if result == "None": raise ValueError('no functions with given ID')
-        f_dict = json.loads(result)
+        existing = _identity_lookup(Function, id)
+        if existing is not None: return existing
+
+        f_dict = connection.fetch('client/function/id/%d/' % id)
+        if f_dict is None: raise ValueError('no functions with given ID')
 
         return Function(
             id=id,
@@ -167,20 +524,21 @@ def function(id=None, fully_qualified_name=None):
         )
 
 
-class Property(object):
+class Property(IdentityMappedObject):
     """
     Class for properties.  Each distinct property used to query the monitored program generates an instance.
     """
 
+    _identity_attribute = "hash"
+
     def __init__(self, hash, serialised_structure=None, index_in_specification_file=None):
         if (serialised_structure==None or index_in_specification_file==None):
             connection = get_connection()
             self.hash = hash
-            result = connection.request('client/property/hash/%s/' % hash)
-            if result == "None":
+            f_dict = connection.fetch('client/property/hash/%s/' % hash)
+            if f_dict is None:
                 raise ValueError('no such property')
             else:
-                f_dict = json.loads(result)
                 self.serialised_structure = f_dict["serialised_structure"]
                 self.index_in_specification_file = f_dict["index_in_specification_file"]
         else:
@@ -203,10 +561,13 @@ def property(hash, serialised_structure=None, index_in_specification_file=None):
 
 
 
-class Binding(object):
+class Binding(IdentityMappedObject):
     """
     A class for bindings.  Each binding recognised by instrumentation generates an instance.
     """
+
+    _relations = {"verdicts": ('client/binding/id/%d/verdicts/', _verdict_from_row)}
+
     def __init__(self, id, binding_space_index, function, binding_statement_lines, property_hash):
         self.id = id
         if binding_space_index is None or function is None or binding_statement_lines is None or property_hash is None:
@@ -228,23 +589,31 @@ class Binding(object):
                    self.property_hash
                )
 
-    def get_verdicts(self):
+    def get_verdicts(self, include=None):
         """
         Get a list of all verdicts attached to the current binding.
+        ``include`` names relationships of the verdicts to load at the same time, as for ``load_related``.
         """
-        connection = get_connection()
-        result = connection.request('client/binding/id/%s/verdicts/' % self.id)
-        if result == "[]":
+        verdict_list = _related_objects(self, "verdicts")
+        if verdict_list == []:
             if warnings_on: print('No such property')
             return []
-        else:
-            result = json.loads(result)
-            verdict_list = []
-            for v in result:
-                new_verdict = verdict(v["id"], v["binding"], v["verdict"], v["time_obtained"], v["function_call"],
-                                      v["collapsing_atom"], v["collapsing_atom_sub_index"])
-                verdict_list.append(new_verdict)
-            return verdict_list
+        load_related(verdict_list, include)
+        return verdict_list
+
+    def iter_verdicts(self, page_size=default_page_size, prefetch=True):
+        """
+        Get a generator over the verdicts attached to the current binding, streamed rather than loaded all at once.
+        If ``prefetch`` is True, verdicts are read in pages of ``page_size`` in the background.
+        """
+        return _iter_related(self, "verdicts", page_size, prefetch)
+
+    def get_verdict_frame(self):
+        """
+        Get a ``VerdictFrame`` holding all verdicts attached to the current binding as columns.
+        """
+        connection = get_connection()
+        return VerdictFrame.from_rows(connection.fetch('client/binding/id/%s/verdicts/' % self.id))
 
 
 def binding(id=None, binding_space_index=None, function=None, binding_statement_lines=None, property_hash=None):
@@ -265,9 +634,10 @@ def binding(id=None, binding_space_index=None, function=None, binding_statement_
         )
 
     elif id is not None:
-        result = connection.request('client/binding/id/%d/' % id)
-        if result == "None": raise ValueError('there is no binding with given id')
-        dict = json.loads(result)
+        existing = _identity_lookup(Binding, id)
+        if existing is not None: return existing
+        dict = connection.fetch('client/binding/id/%d/' % id)
+        if dict is None: raise ValueError('there is no binding with given id')
 
         return Binding(
             id=id,
@@ -279,8 +649,7 @@ def binding(id=None, binding_space_index=None, function=None, binding_statement_
 
     elif function is not None:
 
-        bindings = connection.request("client/function/id/%d/bindings/" % function)
-        result = json.loads(bindings)
+        result = connection.fetch("client/function/id/%d/bindings/" % function)
         if result == []:
             if warnings_on: print("No such bindings")
 
@@ -302,15 +671,8 @@ def binding(id=None, binding_space_index=None, function=None, binding_statement_
             elif type(binding_statement_lines) == list:
                 given_lines = binding_statement_lines
                 
-            new_list = []
-            for b in binding_list:
-                lines = json.loads(b.binding_statement_lines)
-                is_subset = True
-                for given_line in given_lines:
-                    if given_line not in lines: is_subset = False
-                if is_subset: new_list.append(b)
-
-            return new_list
+            given_lines = set(given_lines)
+            return [b for b in binding_list if given_lines.issubset(b.binding_statement_lines)]
 
         else: return binding_list
 
@@ -320,11 +682,29 @@ def binding(id=None, binding_space_index=None, function=None, binding_statement_
         raise Exception("Cannot instantiate single or multiple bindings with parameters given.")
 
 
-class FunctionCall(object):
+def bindings(ids):
+    """
+    Factory function for getting the bindings with each ID in ``ids`` in a single batch of requests.
+    """
+    return _objects_by_ids(Binding, 'client/binding/id/%d/', ids, "binding",
+                           lambda id, d: binding(id, d["binding_space_index"], d["function"],
+                                                 d["binding_statement_lines"], d["property_hash"]))
+
+
+class FunctionCall(IdentityMappedObject, SlotsPickling):
     """
     Class for function calls.  Each distinct call of a monitored function generates an instance.
     """
 
+    # function calls, verdicts, observations and assignments are loaded in large numbers,
+    # so they store their fields in slots rather than a per-instance dictionary
+    __slots__ = ("id", "function", "time_of_call", "end_time_of_call", "trans", "path_condition_id_sequence",
+                 "_related", "__weakref__")
+    _relations = {
+        "verdicts": ('client/function_call/id/%d/verdicts/', _verdict_from_row),
+        "observations": ('client/function_call/id/%d/observations/', _observation_from_row)
+    }
+
     def __init__(self, id, function, time_of_call, end_time_of_call, trans, path_condition_id_sequence):
         self.id = id
         self.function = function
@@ -345,7 +725,7 @@ class FunctionCall(object):
                    self.trans
                )
 
-    def get_verdicts(self, value=None, property=None, binding=None):
+    def get_verdicts(self, value=None, property=None, binding=None, include=None):
         """
         Get a list of verdicts generated during the current function call.
         Value can be 1 or 0.
@@ -354,63 +734,45 @@ class FunctionCall(object):
             If property is given, verdicts will be associated with that property.
         Binding can either be a binding ID or object.
             If binding is given, verdicts will be associated with that binding.
+        Include names relationships of the verdicts to load at the same time, as for ``load_related``.
         """
-        connection = get_connection()
-        if value == None and property==None:
-            result = connection.request('client/function_call/id/%d/verdicts/' % self.id)
-
-        elif property==None:
-            result = connection.request('client/function_call/id/%d/verdict/value/%d/' % (self.id, value))
-
-        elif value==None:
+        if property != None:
             if type(property) == Property:
                 property = property.hash
-            if type(property)==str or type(property)==unicode:
-                result = connection.request('client/function_call/id/%d/hash/%s/verdicts/' % (self.id, property))
-            else:
+            if type(property) != str and type(property) != unicode:
                 raise ValueError("pass property hash or a property object as argument")
-                return
-        else:
-            if type(property) == Property:
-                property = property.hash
-            if type(property)==str or type(property)==unicode:
-                result = connection.request('client/function_call/id/%d/verdict/value/%d/hash/%s/' % (self.id, value, property))
-            else:
-                raise ValueError("pass property hash or a property object as argument")
-                return
-
-        if result == "[]":
-            if warnings_on: print('No verdicts for given function call')
-            return []
 
-        if binding!=None:
+        if binding != None:
             if type(binding) == Binding: binding = binding.id
             if type(binding) != int: raise ValueError("pass binding ID or object as argument")
 
-        verdicts_dict = json.loads(result)
-        verdicts_list = []
-        for v in verdicts_dict:
-            if binding != None and v["binding"]!=binding: continue
-            verdict_class = verdict(v["id"], v["binding"], v["verdict"], v["time_obtained"], v["function_call"],
-                                    v["collapsing_atom"])
-            verdicts_list.append(verdict_class)
+        preloaded = _preloaded(self, "verdicts")
+        if preloaded is not None and property == None:
+            verdicts_list = [v for v in preloaded
+                             if (value == None or v.verdict == value) and (binding == None or v.binding == binding)]
+        else:
+            # let the verdict database or server apply as many of the filters as it can
+            from VyPRAnalysis.orm.query import query
+            filters = dict((name, given) for (name, given) in
+                           [("verdict", value), ("property", property), ("binding", binding)] if given != None)
+            verdicts_list = query(Verdict).filter(function_call=self.id, **filters).all()
+
+        if verdicts_list == []:
+            if warnings_on: print('No verdicts for given function call')
+            return []
+        load_related(verdicts_list, include)
         return verdicts_list
 
-    def get_observations(self):
+    def get_observations(self, include=None):
         """
         Get the list of observations generated during the current function call.
+        ``include`` names relationships of the observations to load at the same time, as for ``load_related``.
         """
-        connection = get_connection()
-        result = connection.request('client/function_call/id/%d/observations/' % self.id)
-        if result == "[]":
+        obs_list = _related_objects(self, "observations")
+        if obs_list == []:
             if warnings_on: print('no observations for given function call')
             return []
-        obs_dict = json.loads(result)
-        obs_list = []
-        for o in obs_dict:
-            obs_class = observation(o["id"], o["instrumentation_point"], o["verdict"], o["observed_value"],
-                                    o["atom_index"], o["previous_condition_offset"])
-            obs_list.append(obs_class)
+        load_related(obs_list, include)
         return obs_list
 
     def reconstruct_path(self, scfg):
@@ -418,8 +780,7 @@ class FunctionCall(object):
         Locally reconstruct the entire path taken by this function call (if there was path instrumentation).
         """
         connection = get_connection()
-        json_result = connection.request('client/path_condition_structure/function_call/%i/' % self.id)
-        path_condition_list = json.loads(json_result)
+        path_condition_list = connection.fetch('client/path_condition_structure/function_call/%i/' % self.id)
         #print("path for whole function")
         #print(path_condition_list)
         #trimmed_path_condition_list = list(reversed(path_condition_list[0:-1]))
@@ -435,11 +796,13 @@ def function_call(id):
     Otherwise, methods on other ORM objects can be used.
     """
 
+    existing = _identity_lookup(FunctionCall, id)
+    if existing is not None: return existing
+
     connection = get_connection()
 
-    result = connection.request('client/function_call/id/%d/' % id)
-    if result == "None": raise ValueError('no function calls with given ID')
-    dict = json.loads(result)
+    dict = connection.fetch('client/function_call/id/%d/' % id)
+    if dict is None: raise ValueError('no function calls with given ID')
 
     return FunctionCall(
         id=id,
@@ -451,7 +814,15 @@ def function_call(id):
     )
 
 
-class TestData(object):
+def function_calls(ids):
+    """
+    Factory function for getting the function calls with each ID in ``ids`` in a single batch of requests.
+    """
+    return _objects_by_ids(FunctionCall, 'client/function_call/id/%d/', ids, "function calls",
+                           lambda id, d: _function_call_from_row(d))
+
+
+class TestData(IdentityMappedObject):
     """
     Class for test data instances.
     Each distinct test case execution, in the testing scenario, generates a distinct instance.
@@ -480,10 +851,9 @@ class TestData(object):
         Get the list of FunctionCall objects representing function calls during this test case execution.
         """
         connection = get_connection()
-        result = connection.request('client/function_call/between/%s/%s/' % (self.start_time, self.end_time))
-        if result == "[]":
+        calls_dict = connection.fetch('client/function_call/between/%s/%s/' % (self.start_time, self.end_time))
+        if calls_dict == []:
             if warnings_on: print('No function calls occurred during test case execution with ID %i' % self.id)
-        calls_dict = json.loads(result)
         calls_list = []
         for call in calls_dict:
             call_class = FunctionCall(call["id"], call["function"], call["time_of_call"], call["end_time_of_call"],
@@ -491,6 +861,15 @@ class TestData(object):
             calls_list.append(call_class)
         return calls_list
 
+    def iter_function_calls(self, page_size=default_page_size, prefetch=True):
+        """
+        Get a generator over the function calls during this test case execution,
+        streamed rather than loaded all at once.
+        If ``prefetch`` is True, calls are read in pages of ``page_size`` in the background.
+        """
+        return _iter_objects('client/function_call/between/%s/%s/' % (self.start_time, self.end_time),
+                             _function_call_from_row, page_size, prefetch)
+
 
 def test_data(id=None, test_name=None, test_result=None, start_time=None, end_time=None):
     """
@@ -512,9 +891,11 @@ def test_data(id=None, test_name=None, test_result=None, start_time=None, end_ti
 
     elif id is not None:
 
-        result = connection.request('client/test_data/id/%d/' % id)
-        if result == "None": raise ValueError('no test data with given ID')
-        dict = json.loads(result)
+        existing = _identity_lookup(TestData, id)
+        if existing is not None: return existing
+
+        dict = connection.fetch('client/test_data/id/%d/' % id)
+        if dict is None: raise ValueError('no test data with given ID')
 
         return TestData(
             id=id,
@@ -525,25 +906,24 @@ def test_data(id=None, test_name=None, test_result=None, start_time=None, end_ti
         )
 
 
-class Verdict(object):
+class Verdict(LazyObject, SlotsPickling):
     """
     Class for verdicts.  Each True or False result generated by monitoring at runtime has an instance.
     """
 
+    __slots__ = ("id", "binding", "verdict", "time_obtained", "function_call", "collapsing_atom",
+                 "collapsing_atom_sub_index", "_related", "__weakref__")
+    _end_point = 'client/verdict/id/%d/'
+    _lazy_fields = ("binding", "verdict", "time_obtained", "function_call", "collapsing_atom",
+                    "collapsing_atom_sub_index")
+    _missing_message = 'no verdicts with given ID'
+    _relations = {"observations": ('client/verdict/id/%d/observations/', _observation_from_row)}
+
     def __init__(self, id, binding=None, verdict=None, time_obtained=None, function_call=None, collapsing_atom=None,
-                 collapsing_atom_sub_index=None):
-        connection = get_connection()
+                 collapsing_atom_sub_index=None, lazy=None):
         self.id = id
         if binding is None:
-            result = connection.request('client/verdict/id/%d/' % self.id)
-            if result == "None": raise ValueError('no verdicts with given ID')
-            d = json.loads(result)
-            self.binding = d["binding"]
-            self.verdict = d["verdict"]
-            self.time_obtained = d["time_obtained"]
-            self.function_call = d["function_call"]
-            self.collapsing_atom = d["collapsing_atom"]
-            self.collapsing_atom_sub_index = d["collapsing_atom_sub_index"]
+            self._load_or_defer(lazy)
         else:
             self.binding = binding
             self.verdict = verdict
@@ -566,28 +946,24 @@ class Verdict(object):
                    self.collapsing_atom_sub_index
                )
 
-    def get_observations(self):
+    def get_observations(self, include=None):
         """
         Get a list of the observations that were needed to obtain the current verdict.
+        ``include`` names relationships of the observations to load at the same time, as for ``load_related``.
         """
-        connection = get_connection()
-        result = connection.request('client/verdict/id/%d/observations/' % self.id)
-        if result == "[]":
+        obs_list = _related_objects(self, "observations")
+        if obs_list == []:
             if warnings_on: print('No observations for given verdict')
             return []
-        obs_dict = json.loads(result)
-        obs_list = []
-        for o in obs_dict:
-            obs_class = observation(o["id"], o["instrumentation_point"], o["verdict"], o["observed_value"],
-                                    o["atom_index"], o["previous_condition_offset"])
-            obs_list.append(obs_class)
+        load_related(obs_list, include)
         return obs_list
 
 
 def verdict(id=None, binding=None, verdict=None, time_obtained=None, function_call=None, collapsing_atom=None,
-            collapsing_atom_sub_index=None):
+            collapsing_atom_sub_index=None, lazy=None):
     """
     Factory function for verdicts.  Gives a single Verdict object or a list, depending on input.
+    If ``lazy`` is True, a verdict requested by its ID is only loaded when its fields are first used.
     """
 
     connection = get_connection()
@@ -607,9 +983,14 @@ def verdict(id=None, binding=None, verdict=None, time_obtained=None, function_ca
 
     elif id is not None:
 
-        result = connection.request('client/verdict/id/%d/' % id)
-        if result == "None": raise ValueError('no verdicts with given ID')
-        d = json.loads(result)
+        existing = _identity_lookup(Verdict, id)
+        if existing is not None: return existing
+
+        if lazy or (lazy is None and lazy_loading):
+            return Verdict(id, lazy=True)
+
+        d = connection.fetch('client/verdict/id/%d/' % id)
+        if d is None: raise ValueError('no verdicts with given ID')
 
         return Verdict(
             id=id,
@@ -626,7 +1007,14 @@ def verdict(id=None, binding=None, verdict=None, time_obtained=None, function_ca
         raise Exception("Cannot instantiate single or multiple verdicts with parameters given.")
 
 
-class Transaction(object):
+def verdicts(ids):
+    """
+    Factory function for getting the verdicts with each ID in ``ids`` in a single batch of requests.
+    """
+    return _objects_by_ids(Verdict, 'client/verdict/id/%d/', ids, "verdicts", lambda id, d: _verdict_from_row(d))
+
+
+class Transaction(LazyObject):
     """
     Class for transactions.
     For web services, transactions are HTTP requests.
@@ -634,43 +1022,47 @@ class Transaction(object):
     For testing, transactions are test class instances generated.
     """
 
-    def __init__(self, id=None, time_of_transaction=None, time_lower_bound=None, time_upper_bound=None):
-        connection = get_connection()
+    _end_point = 'client/transaction/id/%d/'
+    _lazy_fields = ("time_of_transaction",)
+    _missing_message = 'no transaction in the database with given ID'
+    _relations = {"calls": ('client/transaction/id/%d/function_calls/', _function_call_from_row)}
+
+    def __init__(self, id=None, time_of_transaction=None, time_lower_bound=None, time_upper_bound=None, lazy=None):
         if id is not None:
             self.id = id
             if time_of_transaction is None:
-                result = connection.request('client/transaction/id/%d/' % self.id)
-                if result == "None": raise ValueError('no transaction in the database with given ID')
-                d = json.loads(result)
-                self.time_of_transaction = d["time_of_transaction"]
+                self._load_or_defer(lazy)
             else:
                 self.time_of_transaction = time_of_transaction
         elif time_of_transaction is not None:
             self.time_of_transaction = time_of_transaction
-            result = connection.request('client/transaction/time/%s/' % self.time_of_transaction)
-            if result == "None": raise ValueError('no transaction in the database with given time')
-            d = json.loads(result)
+            connection = get_connection()
+            d = connection.fetch('client/transaction/time/%s/' % self.time_of_transaction)
+            if d is None: raise ValueError('no transaction in the database with given time')
             self.id = d["id"]
         else:
             raise ValueError('either id or time_of_transaction argument required')
 
-    def get_calls(self):
+    def get_calls(self, include=None):
         """
         Get a list of all function calls that occurred during the current transaction.
+        ``include`` names relationships of the calls to load at the same time, as for ``load_related``.
         """
-        connection = get_connection()
-        result = connection.request('client/transaction/id/%d/function_calls/' % self.id)
-        if result == "[]":
+        calls_list = _related_objects(self, "calls")
+        if calls_list == []:
             print('No calls during the given request')
             return []
-        calls_dict = json.loads(result)
-        calls_list = []
-        for call in calls_dict:
-            call_class = FunctionCall(call["id"], call["function"], call["time_of_call"], call["end_time_of_call"],
-                                      call["trans"], call["path_condition_id_sequence"])
-            calls_list.append(call_class)
+        load_related(calls_list, include)
         return calls_list
 
+    def iter_calls(self, page_size=default_page_size, prefetch=True):
+        """
+        Get a generator over the function calls that occurred during the current transaction,
+        streamed rather than loaded all at once.
+        If ``prefetch`` is True, calls are read in pages of ``page_size`` in the background.
+        """
+        return _iter_related(self, "calls", page_size, prefetch)
+
     def __repr__(self):
         return "<%s id=%i time_of_transaction=%s>" % (self.__class__.__name__, self.id, str(self.time_of_transaction))
 
@@ -681,34 +1073,36 @@ class Transaction(object):
             return self.id == other.id
 
 
-def transaction(id=None, time_of_transaction=None, time_lower_bound=None, time_upper_bound=None):
+def transaction(id=None, time_of_transaction=None, time_lower_bound=None, time_upper_bound=None, lazy=None):
     """
     Factory function for transactions.  Returns a single object or a list depending on the input.
     """
     connection = get_connection()
     if time_lower_bound is not None and time_upper_bound is not None:
         # we've been given a time interval
-        result = connection.request('client/transaction/time/between/%s/%s/' % (time_lower_bound, time_upper_bound))
-        if result == "None": raise ValueError('No transaction found starting in the time interval %s - %s' %
+        d = connection.fetch('client/transaction/time/between/%s/%s/' % (time_lower_bound, time_upper_bound))
+        if d is None: raise ValueError('No transaction found starting in the time interval %s - %s' %
                                               (time_lower_bound, time_upper_bound))
-        d = json.loads(result)
         trans_dicts = []
         for trans in d:
             trans_obj = Transaction(trans["id"], trans["time_of_transaction"])
             trans_dicts.append(trans_obj)
         return trans_dicts
     else:
-        return Transaction(id, time_of_transaction)
+        return Transaction(id, time_of_transaction, lazy=lazy)
 
 
-class Atom(object):
+class Atom(LazyObject):
     """
     Class for atoms.  Atoms are the lowest-level parts of properties that define constraints over
     measurable quantities.  Each such part generates an instance of this class.
     """
 
-    def __init__(self, id=None, property_hash=None, serialised_structure=None, index_in_atoms=None):
-        connection = get_connection()
+    _end_point = 'client/atom/id/%d/'
+    _lazy_fields = ("property_hash", "serialised_structure", "index_in_atoms")
+    _missing_message = 'no atoms with given ID'
+
+    def __init__(self, id=None, property_hash=None, serialised_structure=None, index_in_atoms=None, lazy=None):
         if id is not None and property_hash is not None and serialised_structure is not None and index_in_atoms is not None:
             self.id = id
             self.property_hash = property_hash
@@ -717,19 +1111,14 @@ class Atom(object):
         else:
             if id is not None:
                 self.id = id
-                result = connection.request('client/atom/id/%d/' % self.id)
-                if result == "None": raise ValueError('no atoms with given ID')
-                d = json.loads(result)
-                self.property_hash = d["property_hash"]
-                self.serialised_structure = d["serialised_structure"]
-                self.index_in_atoms = d["index_in_atoms"]
+                self._load_or_defer(lazy)
             elif index_in_atoms is not None and property_hash is not None:
                 self.index_in_atoms = index_in_atoms
                 self.property_hash = property_hash
-                result = connection.request(
+                connection = get_connection()
+                d = connection.fetch(
                     'client/atom/index/%d/property/%s/' % (self.index_in_atoms, self.property_hash))
-                if result == "None": raise ValueError('no such atoms')
-                d = json.loads(result)
+                if d is None: raise ValueError('no such atoms')
                 self.serialised_structure = d["serialised_structure"]
                 self.id = d["id"]
             else:
@@ -754,51 +1143,66 @@ class Atom(object):
         return obj
 
 
-class instrumentation_point:
+class instrumentation_point(LazyObject):
     """
     Class for instrumentation points.  Each point identified in the monitored program as being needed generates
     an instance here.
     """
 
-    def __init__(self, id, serialised_condition_sequence=None, reaching_path_length=None):
-        connection = get_connection()
+    _end_point = 'client/instrumentation_point/id/%d/'
+    _lazy_fields = ("serialised_condition_sequence", "reaching_path_length")
+    _missing_message = "there is no instrumentation point with given id"
+    _relations = {"observations": ('client/instrumentation_point/id/%d/observations/', _observation_from_row)}
+
+    def __init__(self, id, serialised_condition_sequence=None, reaching_path_length=None, lazy=None):
         self.id = id
         if serialised_condition_sequence is None or reaching_path_length is None:
-            result = connection.request('client/instrumentation_point/id/%d/' % self.id)
-            if result == "None":
-                raise ValueError("there is no instrumentation point with given id")
-            else:
-                d = json.loads(result)
-                self.serialised_condition_sequence = d["serialised_condition_sequence"]
-                self.reaching_path_length = d["reaching_path_length"]
+            self._load_or_defer(lazy)
         else:
             self.serialised_condition_sequence = serialised_condition_sequence
             self.reaching_path_length = reaching_path_length
 
-    def get_observations(self):
+    def get_observations(self, include=None):
         """
         Get the list of all observations recorded by VyPR at the current point in the monitored program.
+        ``include`` names relationships of the observations to load at the same time, as for ``load_related``.
         """
-        connection = get_connection()
-        result = connection.request('client/instrumentation_point/id/%d/observations/' % self.id)
-        if result == "[]":
+        obs_list = _related_objects(self, "observations")
+        if obs_list == []:
             print('no observations for given instrumentation point')
             return []
-        obs_dict = json.loads(result)
-        obs_list = []
-        for o in obs_dict:
-            obs_class = observation(o["id"], o["instrumentation_point"], o["verdict"], o["observed_value"],
-                                    o["atom_index"], o["previous_condition_offset"])
-            obs_list.append(obs_class)
+        load_related(obs_list, include)
         return obs_list
 
+    def iter_observations(self, page_size=default_page_size, prefetch=True):
+        """
+        Get a generator over the observations recorded at the current point in the monitored program,
+        streamed rather than loaded all at once.
+        If ``prefetch`` is True, observations are read in pages of ``page_size`` in the background.
+        """
+        return _iter_related(self, "observations", page_size, prefetch)
+
+    def get_observation_frame(self):
+        """
+        Get an ``ObservationFrame`` holding all observations recorded at the current point as columns.
+        """
+        connection = get_connection()
+        return ObservationFrame.from_rows(
+            connection.fetch('client/instrumentation_point/id/%d/observations/' % self.id)
+        )
+
 
-class Observation(object):
+class Observation(IdentityMappedObject, SlotsPickling):
     """
     Class for observations.  Every measurement made by VyPR to decide whether the property
     defined by a query is True or False generates an instance.
     """
 
+    __slots__ = ("id", "instrumentation_point", "verdict", "observed_value", "observation_time",
+                 "observation_end_time", "atom_index", "sub_index", "previous_condition_offset", "_related",
+                 "__weakref__")
+    _relations = {"assignments": ('client/observation/id/%d/assignments/', _assignment_from_row)}
+
     def __init__(self, id, instrumentation_point=None, verdict=None, observed_value=None, observation_time=None,
                  observation_end_time=None, atom_index=None, sub_index=None, previous_condition_offset=None):
         self.id = id
@@ -828,17 +1232,15 @@ class Observation(object):
                )
 
     def get_assignments(self):
+        preloaded = _preloaded(self, "assignments")
+        if preloaded is not None:
+            return list(preloaded)
         connection = get_connection()
-        result = connection.request('client/observation/id/%d/assignments/' % self.id)
-        if result == "[]":
+        assignment_dict = connection.fetch('client/observation/id/%d/assignments/' % self.id)
+        if assignment_dict == []:
             if warnings_on: ('No assignments paired with given observation')
             return []
-        assignment_dict = json.loads(result)
-        assignment_list = []
-        for a in assignment_dict:
-            assignment_class = Assignment(a["id"])
-            assignment_list.append(assignment_class)
-        return assignment_list
+        return assignments([a["id"] for a in assignment_dict])
 
     def get_instrumentation_point(self):
         """
@@ -851,8 +1253,7 @@ class Observation(object):
         Reconstruct the sequence of edges to reach this observation through the Symbolic Control-Flow Graph given.
         """
         connection = get_connection()
-        json_result = connection.request('client/get_path_condition_sequence/%i/' % self.id)
-        result_dict = json.loads(json_result)
+        result_dict = connection.fetch('client/get_path_condition_sequence/%i/' % self.id)
         path_condition_list = result_dict["path_subchain"]
         path_length = result_dict["path_length"]
         print("reaching path")
@@ -871,9 +1272,10 @@ def observation(id, instrumentation_point=None, verdict=None, observed_value=Non
     connection = get_connection()
     if (instrumentation_point is None or verdict is None or observed_value is None or
             atom_index is None or previous_condition_offset is None):
-        result = connection.request('client/observation/id/%d/' % id)
-        if result == "None": raise ValueError('there is no observation with given id')
-        d = json.loads(result)
+        existing = _identity_lookup(Observation, id)
+        if existing is not None: return existing
+        d = connection.fetch('client/observation/id/%d/' % id)
+        if d is None: raise ValueError('there is no observation with given id')
 
         return Observation(
             id=id,
@@ -900,13 +1302,38 @@ def observation(id, instrumentation_point=None, verdict=None, observed_value=Non
         )
 
 
-class Assignment(object):
-    def __init__(self, id):
-        connection = get_connection()
+def observations(ids):
+    """
+    Factory function for getting the observations with each ID in ``ids`` in a single batch of requests.
+    """
+    return _objects_by_ids(Observation, 'client/observation/id/%d/', ids, "observations",
+                           lambda id, d: _observation_from_row(d))
+
+
+class Assignment(IdentityMappedObject, SlotsPickling):
+
+    __slots__ = ("id", "variable", "value", "type", "__weakref__")
+
+    def __init__(self, id, variable=None, value=None, type=None):
         self.id = id
-        result = connection.request('client/assignment/id/%d/' % self.id)
-        if result == "None": raise ValueError('There is no assignment with given ID')
-        d = json.loads(result)
-        self.variable = d["variable"]
-        self.value = d["value"]  # is it better to keep this serialised or to deserialise it?
-        self.type = d["type"]
+        if variable is None or value is None or type is None:
+            connection = get_connection()
+            d = connection.fetch('client/assignment/id/%d/' % self.id)
+            if d is None: raise ValueError('There is no assignment with given ID')
+            self.variable = d["variable"]
+            self.value = d["value"]  # is it better to keep this serialised or to deserialise it?
+            self.type = d["type"]
+        else:
+            self.variable = variable
+            self.value = value
+            self.type = type
+
+
+def assignments(ids):
+    """
+    Factory function for getting the assignments with each ID in ``ids`` in a single batch of requests.
+    """
+    return _objects_by_ids(
+        Assignment, 'client/assignment/id/%d/', ids, "assignments",
+        lambda id, d: Assignment(id, d["variable"], d["value"], d["type"])
+    )
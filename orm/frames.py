@@ -0,0 +1,176 @@
+"""
+**Columnar result frames for verdicts and observations**
+
+Frames hold each field of a list of rows as a NumPy array, so filtering, grouping and aggregation
+can be vectorised instead of looping over ORM objects.  NumPy is only needed if frames are used.
+"""
+
+
+def _float_or_nan(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class Frame(object):
+    """
+    Base class for columnar frames.  Subclasses give the names of their columns, and how to convert
+    the values of each column from those given by the verdict server.
+    """
+
+    columns = ()
+    # columns that hold timestamps, which are converted to datetime64 arrays
+    time_columns = ()
+
+    def __init__(self, **arrays):
+        for column in self.columns:
+            setattr(self, column, arrays[column])
+
+    def __repr__(self):
+        return "<%s rows=%i>" % (self.__class__.__name__, len(self))
+
+    def __len__(self):
+        return len(getattr(self, self.columns[0]))
+
+    def __getitem__(self, key):
+        """
+        Given a column name, give that column.  Otherwise, ``key`` is a boolean mask or array of indices
+        and a frame containing only the selected rows is given.
+        """
+        if type(key) in (str, type(u"")):
+            return getattr(self, key)
+        return self.__class__(**dict((column, getattr(self, column)[key]) for column in self.columns))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Construct a frame from a list of rows, each a dictionary mapping column names to values,
+        such as those given by the verdict server.
+        """
+        return cls(**dict(
+            (column, cls.to_array(column, [row[column] for row in rows])) for column in cls.columns
+        ))
+
+    @classmethod
+    def to_array(cls, column, values):
+        """Convert the list of values given for ``column`` to an array."""
+        import numpy
+        if column in cls.time_columns:
+            return numpy.array(values, dtype="datetime64[us]")
+        return numpy.array(values, dtype=numpy.int64)
+
+    @classmethod
+    def from_objects(cls, objects):
+        """
+        Construct a frame from a list of ORM objects.
+        """
+        return cls.from_rows([dict((column, getattr(obj, column)) for column in cls.columns) for obj in objects])
+
+    def filter(self, mask):
+        """
+        Give a frame containing the rows for which the boolean array ``mask`` is True,
+        for example ``frame.filter(frame.verdict == 0)``.
+        """
+        return self[mask]
+
+    def group_by(self, column):
+        """
+        Give a ``FrameGroups`` object that aggregates over the rows grouped by their value for ``column``.
+        """
+        return FrameGroups(self, column)
+
+
+class FrameGroups(object):
+    """
+    The rows of a frame grouped by the value of one column.  ``keys`` holds the distinct values of the column,
+    and each aggregate gives an array with one entry per key.
+    """
+
+    def __init__(self, frame, column):
+        import numpy
+        self._frame = frame
+        self.column = column
+        (self.keys, self._group_of_row) = numpy.unique(frame[column], return_inverse=True)
+
+    def __repr__(self):
+        return "<%s column=%s, groups=%i>" % (self.__class__.__name__, self.column, len(self.keys))
+
+    def count(self):
+        """Give the number of rows in each group."""
+        import numpy
+        return numpy.bincount(self._group_of_row, minlength=len(self.keys))
+
+    def sum(self, column):
+        """Give the sum of ``column`` over each group."""
+        import numpy
+        return numpy.bincount(self._group_of_row, weights=self._frame[column], minlength=len(self.keys))
+
+    def mean(self, column):
+        """Give the mean of ``column`` over each group."""
+        return self.sum(column) / self.count()
+
+    def min(self, column):
+        """Give the minimum of ``column`` over each group."""
+        import numpy
+        result = numpy.full(len(self.keys), numpy.inf)
+        numpy.minimum.at(result, self._group_of_row, self._frame[column])
+        return result
+
+    def max(self, column):
+        """Give the maximum of ``column`` over each group."""
+        import numpy
+        result = numpy.full(len(self.keys), -numpy.inf)
+        numpy.maximum.at(result, self._group_of_row, self._frame[column])
+        return result
+
+    def frames(self):
+        """Give a dictionary mapping each key to the frame of rows in its group."""
+        return dict((key, self._frame[self._group_of_row == n]) for (n, key) in enumerate(self.keys))
+
+
+class VerdictFrame(Frame):
+    """
+    Columnar frame of verdicts.
+    """
+
+    columns = ("id", "binding", "verdict", "time_obtained", "function_call", "collapsing_atom")
+    time_columns = ("time_obtained",)
+
+    def failure_rate(self):
+        """Give the proportion of verdicts in the frame that are False."""
+        return float((self.verdict == 0).sum()) / len(self) if len(self) > 0 else 0.0
+
+    def failure_rates_by(self, column):
+        """
+        Give a pair ``(keys, failure rates)`` of arrays, with the proportion of False verdicts for each
+        distinct value of ``column``, for example ``frame.failure_rates_by("binding")``.
+        """
+        groups = self.group_by(column)
+        return (groups.keys, 1.0 - groups.mean("verdict"))
+
+
+class ObservationFrame(Frame):
+    """
+    Columnar frame of observations.  ``observed_value`` holds observed values as floats, with NaN for values
+    that are not numeric, such as timestamps.
+    """
+
+    columns = ("id", "instrumentation_point", "verdict", "observed_value", "observation_time", "atom_index",
+               "sub_index")
+    time_columns = ("observation_time",)
+
+    @classmethod
+    def to_array(cls, column, values):
+        import numpy
+        if column == "observed_value":
+            return numpy.array([_float_or_nan(value) for value in values], dtype=numpy.float64)
+        return super(ObservationFrame, cls).to_array(column, values)
+
+    def observed_value_distribution(self, bins=10):
+        """
+        Give a pair ``(counts, bin edges)`` describing the distribution of numeric observed values in the frame.
+        """
+        import numpy
+        values = self.observed_value[~numpy.isnan(self.observed_value)]
+        return numpy.histogram(values, bins=bins)
@@ -2,23 +2,72 @@
 **Operations to begin analyses with**
 """
 
-import requests
+from collections import OrderedDict
+import itertools
+import datetime
+import array
 import json
 import os
+import threading
+import weakref
 
 # VyPR imports
 import VyPR.SCFG.construction
 from VyPR.SCFG.parse_tree import ParseTree
 
 # VyPRAnalysis imports
-from VyPRAnalysis import get_server, get_connection, get_monitored_service_path
+from VyPRAnalysis import get_connection, get_monitored_service_path
 from VyPRAnalysis.orm.base_classes import (function,
                                            function_call,
                                            verdict,
                                            observation,
+                                           observations,
                                            instrumentation_point,
-                                           test_data)
-from VyPRAnalysis.path_reconstruction import edges_from_condition_sequence, deserialise_condition
+                                           test_data,
+                                           load_related,
+                                           Function,
+                                           FunctionCall,
+                                           _iter_objects,
+                                           _related_objects,
+                                           _function_call_from_row)
+from VyPRAnalysis.orm.query import query, _percentile
+from VyPRAnalysis.streaming import default_page_size
+from VyPRAnalysis.path_reconstruction import (edges_from_condition_sequence,
+                                              paths_from_condition_sequences,
+                                              deserialise_condition,
+                                              transition_table,
+                                              EncodedPath,
+                                              RunLengthPath)
+
+
+# grammars derived from Symbolic Control-Flow Graphs, held for as long as their graph is
+_grammars = weakref.WeakKeyDictionary()
+_grammars_lock = threading.Lock()
+
+
+def _grammar_of(scfg):
+    """
+    Give the grammar of ``scfg``, deriving it only the first time it's needed.
+    """
+    with _grammars_lock:
+        grammar = _grammars.get(scfg)
+    if grammar is None:
+        grammar = scfg.derive_grammar()
+        with _grammars_lock:
+            # another thread may have derived the grammar meanwhile, in which case that one is given
+            grammar = _grammars.setdefault(scfg, grammar)
+    return grammar
+
+
+def _path_key(table, path):
+    """
+    Give a value identifying ``path``, which is equal for equal paths through the graph of ``table``,
+    or None if the path holds elements that aren't in the graph, such as the parameters of a parametric path.
+    """
+    try:
+        return table.run_length(path).key()
+    except ValueError:
+        return None
 
 
 """
@@ -31,10 +80,9 @@ def list_functions():
     Get a list of all existing functions from the server.
     """
     connection = get_connection()
-    result = connection.request('client/function/')
-    if result == "None":
+    f_dict = connection.fetch('client/function/')
+    if f_dict is None:
         raise ValueError('No functions currently exist.')
-    f_dict = json.loads(result)
     f_list = []
     for f in f_dict:
         f_obj = function(f["id"], f["fully_qualified_name"])
@@ -42,15 +90,22 @@ def list_functions():
     return f_list
 
 
+def iter_functions(page_size=default_page_size, prefetch=True):
+    """
+    Get a generator over all existing functions, streamed from the server rather than loaded all at once.
+    """
+    return _iter_objects('client/function/', lambda f: function(f["id"], f["fully_qualified_name"]),
+                         page_size, prefetch)
+
+
 def list_test_data():
     """
     Get a list of all existing test cases from the server.
     """
     connection = get_connection()
-    result = connection.request('client/test_data/')
-    if result == "None":
+    results = connection.fetch('client/test_data/')
+    if results is None:
         raise ValueError('No test cases currently exist.')
-    results = json.loads(result)
     test_case_objs = []
     for test_case_row in results:
         test_case_obj = test_data(
@@ -63,46 +118,99 @@ def list_test_data():
         test_case_objs.append(test_case_obj)
     return test_case_objs
 
+"""
+Functions for fetching from the verdict server concurrently.
+"""
+
+
+def fetch_concurrently(function, objects):
+    """
+    Apply ``function`` to each element of ``objects``, keeping up to the connection's concurrency limit of
+    requests to the verdict server in flight at once.  Results are returned in the same order as ``objects``.
+
+    ``function`` can be a factory or any accessor, for example ``fetch_concurrently(verdict, verdict_ids)``
+    or ``fetch_concurrently(lambda call: call.get_observations(), calls)``.
+    """
+    connection = get_connection()
+    return connection.map(function, objects)
+
+
+def get_calls_concurrently(functions):
+    """
+    Given a list of ``Function`` objects, get the list of calls of each one concurrently.
+    """
+    return fetch_concurrently(lambda f: f.get_calls(), functions)
+
+
+def get_verdicts_concurrently(function_calls, value=None, property=None, binding=None):
+    """
+    Given a list of ``FunctionCall`` objects, get the list of verdicts generated during each one concurrently.
+    ``value``, ``property`` and ``binding`` are interpreted as they are by ``FunctionCall.get_verdicts``.
+    """
+    return fetch_concurrently(lambda call: call.get_verdicts(value, property, binding), function_calls)
+
+
+def get_observations_concurrently(verdicts):
+    """
+    Given a list of ``Verdict`` objects, get the list of observations needed to obtain each one concurrently.
+    """
+    return fetch_concurrently(lambda v: v.get_observations(), verdicts)
+
+
+def get_assignments_concurrently(observations):
+    """
+    Given a list of ``Observation`` objects, get the list of assignments paired with each one concurrently.
+    """
+    return fetch_concurrently(lambda obs: obs.get_assignments(), observations)
+
+
 """
 Post-processing functions.
 """
 
 
+def _function_named(function_name):
+    functions = function(fully_qualified_name=function_name)
+    if functions == []: raise ValueError('no functions named %s' % function_name)
+    return functions[0]
+
+
 def get_parametric_path(obs_id_list, instrumentation_point_id=None):
+    # checking if all the observations are made at the same point
+    obs_list = observations(obs_id_list)
     # instrumentation_point optional -> get it from an observation in the list
     if instrumentation_point_id == None:
-        instrumentation_point_id = observation(obs_id_list[0]).instrumentation_point
+        instrumentation_point_id = obs_list[0].instrumentation_point
 
-    # checking if all the observations are made at the same point
-    for id in obs_id_list:
-        obs = observation(id)
+    for obs in obs_list:
         if obs.instrumentation_point != instrumentation_point_id:
             raise ValueError('the observations must have the same instrumentation point')
 
     data1 = {"observation_ids": obs_id_list, "instrumentation_point_id": instrumentation_point_id}
-    req = requests.post(url=get_server() + 'client/get_parametric_path/', data=json.dumps(data1))
+    connection = get_connection()
+    result = connection.post('client/get_parametric_path/', json.dumps(data1))
 
-    return req.text
+    return result
 
 
 def get_intersection_from_observations(function_name, obs_id_list, inst_point=None):
+    # checking if all the observations are made at the same point
+    obs_list = observations(obs_id_list)
     if inst_point == None:
-        inst_point = observation(obs_id_list[0]).instrumentation_point
+        inst_point = obs_list[0].instrumentation_point
 
-    # checking if all the observations are made at the same point
-    for id in obs_id_list:
-        obs = observation(id)
+    for obs in obs_list:
         if obs.instrumentation_point != inst_point:
             raise ValueError('the observations must have the same instrumentation point')
 
-    f = function(fully_qualified_name=function_name)
+    f = _function_named(function_name)
     subchain_text = get_parametric_path(obs_id_list, inst_point)
     #    print(subchain_text)
     subchain_dict = json.loads(subchain_text)
     #    pprint(subchain_dict)
 
     seq = subchain_dict["intersection_condition_sequence"]
-    scfg = f.get_graph()
+    scfg = f.get_scfg()
     ipoint = instrumentation_point(inst_point)
 
     intersection_path = edges_from_condition_sequence(
@@ -113,26 +221,33 @@ def get_intersection_from_observations(function_name, obs_id_list, inst_point=No
     return intersection_path
 
 
-def get_paths_from_observations(function_name, obs_id_list, inst_point=None):
+def get_paths_from_observations(function_name, obs_id_list, inst_point=None, processes=None, encoded=False,
+                                run_length=False):
     """
     returns a list of paths taken before each of the given observations
+    ``processes`` is the number of worker processes to reconstruct the paths in, as for ``set_reconstruction_processes``
+    if ``encoded`` is True, the paths are given as ``EncodedPath`` objects rather than lists of edges,
+    and if ``run_length`` is True, they are given as ``RunLengthPath`` objects
     """
 
+    # checking if all the observations are made at the same point
+    obs_list = observations(obs_id_list)
     if inst_point == None:
-        inst_point = observation(obs_id_list[0]).instrumentation_point
+        inst_point = obs_list[0].instrumentation_point
 
-    # checking if all the observations are made at the same point
-    for id in obs_id_list:
-        obs = observation(id)
+    for obs in obs_list:
         if obs.instrumentation_point != inst_point:
             raise ValueError('the observations must have the same instrumentation point')
 
-    f = function(fully_qualified_name=function_name)
+    f = _function_named(function_name)
     subchain_text = get_parametric_path(obs_id_list, inst_point)
     subchain_dict = json.loads(subchain_text)
 
-    paths = []
+    subchains = []
     seq = subchain_dict["intersection_condition_sequence"]
+    # the graph and instrumentation point are the same for every observation
+    scfg = f.get_scfg()
+    ipoint = instrumentation_point(inst_point)
 
     for id in obs_id_list:
 
@@ -150,12 +265,9 @@ def get_paths_from_observations(function_name, obs_id_list, inst_point=None):
             ind += 1
 
         subchain = subchain[1:]
-        scfg = f.get_graph()
-        ipoint = instrumentation_point(inst_point)
-        path = edges_from_condition_sequence(scfg, subchain, ipoint.reaching_path_length)
-        paths.append(path)
+        subchains.append(subchain)
 
-    return paths
+    return paths_from_condition_sequences(scfg, subchains, ipoint.reaching_path_length, processes, encoded, run_length)
 
 
 """
@@ -206,13 +318,32 @@ class PathParameter(object):
 class PathCollection(object):
     """
     Models a set of paths, obtained by direct reconstruction or modification of already reconstructed paths.
+
+    If ``distinct`` is True, each distinct path is held once along with the number of times it was given, so
+    the memory held grows with the number of distinct paths rather than the number of paths, and ``paths``
+    can be a generator.
     """
 
-    def __init__(self, paths, scfg, function_name, parametric=False):
-        self._paths = paths
+    def __init__(self, paths, scfg, function_name, parametric=False, counts=None, distinct=False):
         self._scfg = scfg
         self._function_name = function_name
         self._parametric = parametric
+        # intersection trees and disagreements found so far, by the vertex the parse trees started at
+        self._intersections = {}
+        self._disagreements = {}
+        self._distinct = distinct
+        if distinct:
+            self._table = transition_table(scfg)
+            # path key -> index of the path in self._paths
+            self._indices = {}
+            self._paths = []
+            self._counts = []
+            for (n, path) in enumerate(paths):
+                self.add_path(path, counts[n] if counts is not None else 1)
+        else:
+            self._paths = paths
+            # the number of times each path was taken, when the paths are the distinct paths of a ``PathMultiset``
+            self._counts = counts if counts is not None else [1] * len(paths)
 
     def __repr__(self):
         return "<%s paths=%s>" % \
@@ -221,24 +352,27 @@ class PathCollection(object):
                    "\n\n".join(map(str, self._paths))
                )
 
+    def _intersection_tree(self, starting_vertex=None):
+        """
+        Give the intersection of the parse trees of all paths in the current collection.
+        """
+        if starting_vertex not in self._intersections:
+            intersection = PathIntersection(self._scfg, starting_vertex, self._parametric)
+            intersection.add_all(self._paths)
+            self._intersections[starting_vertex] = intersection
+        return self._intersections[starting_vertex].tree()
+
     def find_disagreement(self, starting_vertex=None):
         """
         Return a ``ParametricPathCollection`` instance containing the single path resulting from the intersection
         of all paths in the current collection.
+
+        The result is computed once, and the same collection is given by later calls.
         """
-        grammar = self._scfg.derive_grammar()
+        if starting_vertex in self._disagreements:
+            return self._disagreements[starting_vertex]
 
-        parse_trees = map(
-            lambda path: ParseTree(
-                path,
-                grammar,
-                self._scfg.starting_vertices if not (starting_vertex) else starting_vertex,
-                parametric=self._parametric
-            ),
-            self._paths
-        )
-        # determine intersection of the parse trees
-        intersection_tree = parse_trees[0].intersect(parse_trees[1:])
+        intersection_tree = self._intersection_tree(starting_vertex)
         # determine path with parameters
         parametric_path = intersection_tree.read_leaves()
         # for any parameters in the path, determine the paths to those parameters
@@ -247,21 +381,25 @@ class PathCollection(object):
         path_parameters = map(lambda param : PathParameter(param, self._function_name), path_parameters)
         # construct the final path collection
         if not (starting_vertex):
-            return ParametricPathCollection(
+            disagreement = ParametricPathCollection(
                 [parametric_path],
                 self._paths,
                 path_parameters,
                 self._scfg,
-                self._function_name
+                self._function_name,
+                self._counts
             )
         else:
-            return PartialParametricPathCollection(
+            disagreement = PartialParametricPathCollection(
                 [parametric_path],
                 self._paths,
                 path_parameters,
                 self._scfg,
-                self._function_name
+                self._function_name,
+                self._counts
             )
+        self._disagreements[starting_vertex] = disagreement
+        return disagreement
 
     def show_critical_points_in_file(self, filename=None, verbose=False):
         """
@@ -333,7 +471,28 @@ class PathCollection(object):
         """
         Add ``other_path_collection`` to the current list of paths.
         """
-        self._paths += other_path_collection._paths
+        for (path, count) in list(zip(other_path_collection._paths, other_path_collection._counts)):
+            self.add_path(path, count)
+
+    def add_path(self, path, count=1):
+        """
+        Add ``path``, taken ``count`` times, to the current list of paths.  A path that is not already held means
+        any intersection already found is found again, over every distinct path, the next time it is needed.
+        """
+        if self._distinct:
+            key = _path_key(self._table, path)
+            if key in self._indices:
+                # the path is already held, so only its count changes
+                self._counts[self._indices[key]] += count
+                return
+            if key is not None:
+                self._indices[key] = len(self._paths)
+        self._paths.append(path)
+        self._counts.append(count)
+        for intersection in self._intersections.values():
+            intersection.add(path)
+        # the disagreement of the paths may be different now
+        self._disagreements = {}
 
     def __sub__(self, other):
         """
@@ -344,17 +503,95 @@ class PathCollection(object):
             raise Exception("Cannot form a difference of sets of paths when sets have different sizes.")
 
         differences = []
-        for (n, path) in enumerate(self._paths):
+        for (path, other_path) in zip(self._paths, other._paths):
+            # loops are written out, since the paths may diverge part way through one
+            if isinstance(path, RunLengthPath):
+                path = path.expand()
+            if isinstance(other_path, RunLengthPath):
+                other_path = other_path.expand()
             # make sure we can subtract the paths
-            if len(path) < len(other._paths[n]):
+            if len(path) < len(other_path):
                 raise Exception("To compute path_1 - path_2, path_2 cannot be longer than path_1.")
             # make sure the shorter path is actually a subpath
-            for i in range(len(other._paths[n])):
-                if path[i] != other._paths[n][i]:
+            if isinstance(path, EncodedPath) and isinstance(other_path, EncodedPath):
+                if not path.startswith(other_path):
                     raise Exception("path_1 - path_2 requires that path_2 is a subpath of path_1.")
-            differences.append(path[len(other._paths[n]):])
+            else:
+                for i in range(len(other_path)):
+                    if path[i] != other_path[i]:
+                        raise Exception("path_1 - path_2 requires that path_2 is a subpath of path_1.")
+            differences.append(path[len(other_path):])
 
-        return PartialPathCollection(differences, self._scfg, self._function_name)
+        return PartialPathCollection(differences, self._scfg, self._function_name, counts=list(self._counts))
+
+    def get_counts(self):
+        """
+        Get the number of times each path in the current collection was taken.
+        """
+        return self._counts
+
+
+class PathIntersection(object):
+    """
+    Finds the intersection of the parse trees of paths through ``scfg`` that are added one at a time, so the paths
+    can come from a generator.  The parse tree of each distinct path is held once, so the memory held is bounded by
+    the number of distinct paths rather than the number of paths, but is not bounded otherwise.
+
+    The intersection is found over all of those parse trees at once, exactly as for a list of the paths.  Adding
+    a path that hasn't been added before means the whole intersection is found again by the next call to ``tree``,
+    so ``tree`` is best called once the paths have been added.
+    """
+
+    def __init__(self, scfg, starting_vertex=None, parametric=False):
+        self._scfg = scfg
+        self._grammar = _grammar_of(scfg)
+        self._table = transition_table(scfg)
+        self._starting_vertex = starting_vertex
+        self._parametric = parametric
+        # path key -> parse tree, for each distinct path added so far
+        self._parse_trees = OrderedDict()
+        self._tree = None
+        self.paths = 0
+
+    def _parse_tree(self, path):
+        return ParseTree(
+            list(path),
+            self._grammar,
+            self._scfg.starting_vertices if not (self._starting_vertex) else self._starting_vertex,
+            parametric=self._parametric
+        )
+
+    def add(self, path):
+        """
+        Add ``path`` to the paths whose intersection is found.
+        """
+        key = _path_key(self._table, path)
+        if key is None:
+            # the path can't be compared with the others, so it is held as a distinct path
+            key = ("path", len(self._parse_trees))
+        if key not in self._parse_trees:
+            self._parse_trees[key] = self._parse_tree(path)
+            # the intersection is found again when it is next needed
+            self._tree = None
+        self.paths += 1
+
+    def add_all(self, paths):
+        """
+        Add every path given by the iterable ``paths`` to the paths whose intersection is found.
+        """
+        for path in paths:
+            self.add(path)
+
+    def tree(self):
+        """
+        Give the intersection of the parse trees of the paths added so far.
+        """
+        if not self._parse_trees:
+            raise ValueError("no paths have been added")
+        if self._tree is None:
+            parse_trees = list(self._parse_trees.values())
+            self._tree = parse_trees[0].intersect(parse_trees[1:])
+        return self._tree
 
 
 class ParametricPathCollection(PathCollection):
@@ -363,9 +600,10 @@ class ParametricPathCollection(PathCollection):
     of the monitored function.
     """
 
-    def __init__(self, paths, original_paths, path_parameters, scfg, function_name):
+    def __init__(self, paths, original_paths, path_parameters, scfg, function_name, original_counts=None):
         PathCollection.__init__(self, paths, scfg, function_name, parametric=True)
         self._original_paths = original_paths
+        self._original_counts = original_counts if original_counts is not None else [1] * len(original_paths)
         self._path_parameters = path_parameters
 
 
@@ -389,11 +627,14 @@ class PartialParametricPathCollection(PathCollection):
     start at the beginning of the monitored function.
     """
 
-    def __init__(self, paths, original_paths, path_parameters, scfg, function_name):
+    def __init__(self, paths, original_paths, path_parameters, scfg, function_name, original_counts=None):
         PathCollection.__init__(self, paths, scfg, function_name, parametric=True)
         self._original_paths = original_paths
+        self._original_counts = original_counts if original_counts is not None else [1] * len(original_paths)
         self._path_parameters = path_parameters
-        self._grammar = scfg.derive_grammar()
+        self._grammar = _grammar_of(scfg)
+        # parse trees of the original paths, built the first time they're needed
+        self._original_parse_trees = None
 
     def find_disagreement(self):
         """
@@ -416,15 +657,105 @@ class PartialParametricPathCollection(PathCollection):
         parametric path.
         """
         path_parameter = path_parameter.path
+        if self._original_parse_trees is None:
+            self._original_parse_trees = [
+                ParseTree(list(path), self._grammar, path[0]._source_state, parametric=True)
+                for path in self._original_paths
+            ]
         parameter_values = []
-        for path in self._original_paths:
-            parse_tree = ParseTree(path, self._grammar, path[0]._source_state, parametric=True)
+        for parse_tree in self._original_parse_trees:
             subtree = parse_tree.get_parameter_subtree(path_parameter)
             subpath = subtree.read_leaves()
             parameter_values.append(subpath)
 
         return parameter_values
 
+    def get_subpath_counts(self, path_parameter):
+        """
+        Given a ``PathParameter`` object in ``path_parameter``, get a list of pairs ``(subpath, count)`` giving
+        each distinct subpath given to it and the number of times it was taken, most common first.
+        """
+        subpath_counts = OrderedDict()
+        for (subpath, count) in zip(self.get_subpaths_in_region(path_parameter), self._original_counts):
+            key = tuple(map(id, subpath))
+            if key in subpath_counts:
+                subpath_counts[key][1] += count
+            else:
+                subpath_counts[key] = [subpath, count]
+        return sorted(map(tuple, subpath_counts.values()), key=lambda pair: -pair[1])
+
+
+class PathMultiset(object):
+    """
+    A multiset of paths through ``scfg``.  Each distinct path is held once, with the number of times it was added
+    and the IDs of up to ``max_representatives`` of the objects, such as function calls or observations,
+    it was reconstructed for.
+    """
+
+    def __init__(self, scfg, function_name, max_representatives=10):
+        self._scfg = scfg
+        self._function_name = function_name
+        self._table = transition_table(scfg)
+        self._max_representatives = max_representatives
+        # path fingerprint -> [path, count, representative IDs]
+        self._paths = OrderedDict()
+        self.total = 0
+
+    def __repr__(self):
+        return "<%s distinct=%i, total=%i>" % (self.__class__.__name__, len(self._paths), self.total)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def fingerprint(self, path):
+        """
+        Give a value identifying ``path``, which is equal for equal paths through the same graph.
+        """
+        return self._table.run_length(path).key()
+
+    def add(self, path, representative=None, count=1, fingerprint=None):
+        """
+        Add ``path``, taken ``count`` times.  ``representative`` is the ID of an object the path was taken by.
+        ``fingerprint`` can be given if it is already known, to save finding it again.
+        """
+        if fingerprint is None:
+            fingerprint = self.fingerprint(path)
+        entry = self._paths.get(fingerprint)
+        if entry is None:
+            entry = [path, 0, []]
+            self._paths[fingerprint] = entry
+        entry[1] += count
+        if representative is not None and len(entry[2]) < self._max_representatives:
+            entry[2].append(representative)
+        self.total += count
+
+    def count(self, path):
+        """
+        Get the number of times ``path`` was added.
+        """
+        entry = self._paths.get(self.fingerprint(path))
+        return entry[1] if entry is not None else 0
+
+    def items(self):
+        """
+        Get a list of triples ``(path, count, representative IDs)``, one for each distinct path, most common first.
+        """
+        return sorted([tuple(entry) for entry in self._paths.values()], key=lambda entry: -entry[1])
+
+    def to_path_collection(self):
+        """
+        Give a ``PathCollection`` holding each distinct path once, with its count.  Intersections and disagreements
+        of the collection are then found over the distinct paths only.
+        """
+        items = self.items()
+        return PathCollection(
+            [path for (path, count, representatives) in items],
+            self._scfg,
+            self._function_name,
+            counts=[count for (path, count, representatives) in items],
+            distinct=True
+        )
+
 
 class ObservationCollection(object):
     """
@@ -434,11 +765,10 @@ class ObservationCollection(object):
     def __init__(self, observations):
         self._observations = observations
 
-    def to_paths(self, scfg):
+    def _condition_sequences(self):
         """
-        Based on the relevant Symbolic Control-Flow Graph for the current collection of observations,
-        reconstruct the paths up to each observation through the Symbolic Control-Flow Graph and return a
-        ``PathCollection``.
+        Give the name of the function, the reaching path length of the instrumentation point and the condition
+        sequence of each observation.
         """
 
         connection = get_connection()
@@ -464,18 +794,250 @@ class ObservationCollection(object):
 
         condition_sequences = []
         for observation in self._observations:
-            result_dictionary = json.loads(
-                connection.request("client/get_path_condition_sequence/%i/" % observation.id)
-            )
+            result_dictionary = connection.fetch("client/get_path_condition_sequence/%i/" % observation.id)
             condition_sequence = result_dictionary["path_subchain"]
 
             #condition_sequence = map(deserialise_condition, condition_sequence)
             condition_sequences.append(condition_sequence)
 
-        paths = []
+        return (function_name, reaching_path_length, condition_sequences)
+
+    def to_paths(self, scfg, processes=None, encoded=False, run_length=False):
+        """
+        Based on the relevant Symbolic Control-Flow Graph for the current collection of observations,
+        reconstruct the paths up to each observation through the Symbolic Control-Flow Graph and return a
+        ``PathCollection``.
 
-        for condition_sequence in condition_sequences:
-            reconstructed_path = edges_from_condition_sequence(scfg, condition_sequence, reaching_path_length)
-            paths.append(reconstructed_path)
+        ``processes`` is the number of worker processes to reconstruct the paths in, as for
+        ``set_reconstruction_processes``.  If ``encoded`` is True, the paths are held as ``EncodedPath`` objects,
+        which take far less memory than lists of edges.  If ``run_length`` is True, they are held as
+        ``RunLengthPath`` objects, whose size doesn't grow with the number of iterations of loops.
+        """
+        (function_name, reaching_path_length, condition_sequences) = self._condition_sequences()
+
+        paths = paths_from_condition_sequences(
+            scfg, condition_sequences, reaching_path_length, processes, encoded, run_length
+        )
 
         return PathCollection(paths, scfg, function_name)
+
+    def to_path_multiset(self, scfg, processes=None, max_representatives=10):
+        """
+        As ``to_paths``, but give a ``PathMultiset`` in which each distinct path is reconstructed and held once,
+        with the number of observations reached by it and the IDs of up to ``max_representatives`` of them.
+        """
+        (function_name, reaching_path_length, condition_sequences) = self._condition_sequences()
+
+        # observations with the same condition sequence reach them by the same path
+        distinct_sequences = OrderedDict()
+        for (observation, condition_sequence) in zip(self._observations, condition_sequences):
+            key = json.dumps(condition_sequence)
+            if key not in distinct_sequences:
+                distinct_sequences[key] = (condition_sequence, [])
+            distinct_sequences[key][1].append(observation.id)
+
+        paths = paths_from_condition_sequences(
+            scfg,
+            [condition_sequence for (condition_sequence, ids) in distinct_sequences.values()],
+            reaching_path_length,
+            processes,
+            run_length=True
+        )
+
+        multiset = PathMultiset(scfg, function_name, max_representatives)
+        for (path, (condition_sequence, ids)) in zip(paths, distinct_sequences.values()):
+            for id in ids[:max_representatives]:
+                multiset.add(path, id)
+            if len(ids) > max_representatives:
+                multiset.add(path, count=len(ids) - max_representatives)
+        return multiset
+
+
+"""
+Path profiling.
+"""
+
+
+def _time_of(text):
+    # give the datetime stored as ``text`` by the verdict server
+    for time_format in ("%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.datetime.strptime(text, time_format)
+        except ValueError:
+            pass
+    raise ValueError("cannot read the time '%s'" % text)
+
+
+def _duration_of(call):
+    # give the duration of ``call`` in seconds, or None if it has not finished
+    if not call.time_of_call or not call.end_time_of_call:
+        return None
+    difference = _time_of(call.end_time_of_call) - _time_of(call.time_of_call)
+    return difference.days * 86400 + difference.seconds + difference.microseconds / 1000000.0
+
+
+class PathProfile(object):
+    """
+    A profile of the paths taken by the calls of the function ``function``, given as a ``Function`` or by its
+    fully-qualified name.  For each distinct path, the profile holds the number of calls that took it, their
+    durations and the verdicts generated during them.
+
+    The profile is built by ``update``, which only adds the calls made since it was last called.  With a verdict
+    database, only those calls are read, so the profile of a running service can be kept up to date cheaply.  The
+    verdict server has no end-point for calls after a given ID, so with a server every call of the function is still
+    streamed and the older ones are skipped on the client.  The durations and verdicts of calls that had not finished
+    when they were added are added by a later ``update``, once the calls have finished.  Paths are reconstructed
+    once for each distinct path condition sequence, in ``processes`` worker processes as for
+    ``set_reconstruction_processes``.
+    """
+
+    def __init__(self, function, processes=None, max_representatives=10):
+        self._function = function if isinstance(function, Function) else _function_named(function)
+        self._scfg = self._function.get_scfg()
+        self._processes = processes
+        self._paths = PathMultiset(self._scfg, self._function.fully_qualified_name, max_representatives)
+        # path condition id sequence -> path fingerprint
+        self._fingerprints = {}
+        # path fingerprint -> durations of the calls taking the path, and the counts of their verdicts and failures
+        self._durations = {}
+        self._verdicts = {}
+        self._last_call_id = 0
+        # IDs of the calls added to the profile before they finished
+        self._unfinished = set()
+
+    def __repr__(self):
+        return "<%s function='%s', calls=%i, paths=%i>" % \
+               (
+                   self.__class__.__name__,
+                   self._function.fully_qualified_name,
+                   self._paths.total,
+                   len(self._paths)
+               )
+
+    def _reconstruct(self, calls):
+        """
+        Reconstruct the paths of the distinct path condition sequences of ``calls`` that haven't been seen before.
+        """
+        new_sequences = OrderedDict()
+        for call in calls:
+            if call.path_condition_id_sequence not in self._fingerprints:
+                new_sequences.setdefault(call.path_condition_id_sequence, call.id)
+        if not new_sequences:
+            return
+        conditions = get_connection().fetch_many(
+            ['client/path_condition_structure/function_call/%i/' % call_id for call_id in new_sequences.values()]
+        )
+        paths = paths_from_condition_sequences(
+            self._scfg,
+            [condition_list or [] for condition_list in conditions],
+            -1,
+            self._processes,
+            run_length=True
+        )
+        for (sequence, path) in zip(new_sequences.keys(), paths):
+            fingerprint = self._paths.fingerprint(path)
+            self._fingerprints[sequence] = (fingerprint, path)
+            if fingerprint not in self._durations:
+                self._durations[fingerprint] = array.array("d")
+                self._verdicts[fingerprint] = [0, 0]
+
+    def update(self, page_size=default_page_size):
+        """
+        Add the calls of the function made since the profile was last updated, reading them in pages
+        of ``page_size``.  Only a verdict database reads just the new calls; a verdict server gives every call.
+        """
+        if self._unfinished:
+            self._update_unfinished(page_size)
+        # only the calls that haven't been profiled yet are read
+        calls = iter(query(FunctionCall).filter(function=self._function, id__gt=self._last_call_id))
+        while True:
+            page = list(itertools.islice(calls, page_size))
+            if not page:
+                break
+            self._reconstruct(page)
+            for call in page:
+                (fingerprint, path) = self._fingerprints[call.path_condition_id_sequence]
+                self._paths.add(path, call.id, fingerprint=fingerprint)
+                self._last_call_id = max(self._last_call_id, call.id)
+            self._add_finished(page)
+        return self
+
+    def _update_unfinished(self, page_size):
+        """
+        Read the calls that had not finished when they were added to the profile again, and add the durations
+        and verdicts of those that have finished since.
+        """
+        rows = query(FunctionCall).filter(function=self._function, id__ge=min(self._unfinished),
+                                          id__le=self._last_call_id).rows()
+        while True:
+            page = list(itertools.islice(rows, page_size))
+            if not page:
+                break
+            calls = []
+            for row in page:
+                if row["id"] in self._unfinished and row["end_time_of_call"]:
+                    call = _function_call_from_row(row)
+                    # the call may have been materialised before it finished
+                    call.end_time_of_call = row["end_time_of_call"]
+                    calls.append(call)
+            self._add_finished(calls)
+
+    def _add_finished(self, calls):
+        """
+        Add the durations and verdicts of the calls in ``calls`` that have finished, and remember the others
+        so they can be added once they finish.
+        """
+        finished = []
+        for call in calls:
+            duration = _duration_of(call)
+            if duration is None:
+                self._unfinished.add(call.id)
+                continue
+            self._unfinished.discard(call.id)
+            fingerprint = self._fingerprints[call.path_condition_id_sequence][0]
+            self._durations[fingerprint].append(duration)
+            finished.append((call, fingerprint))
+        load_related([call for (call, fingerprint) in finished], ["verdicts"])
+        for (call, fingerprint) in finished:
+            verdict_counts = self._verdicts[fingerprint]
+            for v in _related_objects(call, "verdicts"):
+                verdict_counts[0] += 1
+                verdict_counts[1] += (v.verdict == 0)
+
+    def report(self, percentiles=(50, 90, 99)):
+        """
+        Give a list with a dictionary for each distinct path, hottest first.  Each dictionary holds the ``path``,
+        the number of calls taking it as ``count``, the proportion of all calls taking it as ``frequency``,
+        the IDs of some of those calls as ``representatives``, the ``min``, ``max`` and ``mean`` of their durations
+        in seconds along with each percentile in ``percentiles`` under keys such as ``p99``, and the number of
+        ``verdicts`` generated during the calls, the number of ``failures`` and the ``failure_rate``.
+        """
+        report = []
+        for (path, count, representatives) in self._paths.items():
+            fingerprint = self._paths.fingerprint(path)
+            durations = sorted(self._durations[fingerprint])
+            (verdicts, failures) = self._verdicts[fingerprint]
+            entry = {
+                "path": path,
+                "count": count,
+                "frequency": float(count) / self._paths.total,
+                "representatives": representatives,
+                "min": durations[0] if durations else None,
+                "max": durations[-1] if durations else None,
+                "mean": sum(durations) / len(durations) if durations else None,
+                "verdicts": verdicts,
+                "failures": failures,
+                "failure_rate": float(failures) / verdicts if verdicts > 0 else None
+            }
+            for percentile in percentiles:
+                entry["p%s" % percentile] = _percentile(durations, percentile) if durations else None
+            report.append(entry)
+        return report
+
+
+def profile_paths(function, processes=None, page_size=default_page_size):
+    """
+    Give a ``PathProfile`` of the paths taken by the calls of ``function``, given as a ``Function`` or by its
+    fully-qualified name.  Call ``update`` on the profile later to add calls made since.
+    """
+    return PathProfile(function, processes).update(page_size)
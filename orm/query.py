@@ -0,0 +1,551 @@
+"""
+**Composable queries over functions, calls, verdicts and observations**
+
+A query is built up from filters, an ordering and a limit, and is only run when its results are needed.
+With a local database, the whole query is compiled to SQL.  With a verdict server, the most selective end-point
+for the filters given is requested, and any filters that end-point doesn't apply are checked as rows arrive.
+
+Queries can also be summarised, optionally in groups, by counts, failure ratios and statistics of observed values.
+With a local database only the summary rows are read from it.
+"""
+import datetime
+import itertools
+import math
+import operator
+
+# VyPRAnalysis imports
+from VyPRAnalysis import get_connection
+from VyPRAnalysis.local_database import VerdictDatabaseConnection
+from VyPRAnalysis.orm.base_classes import (Function,
+                                           FunctionCall,
+                                           Verdict,
+                                           Observation,
+                                           Property,
+                                           binding,
+                                           bindings,
+                                           verdict,
+                                           verdicts,
+                                           _function_call_from_row,
+                                           _verdict_from_row,
+                                           _observation_from_row)
+from VyPRAnalysis.orm.frames import _float_or_nan
+from VyPRAnalysis.streaming import default_page_size
+
+# the length of the prefix of an ISO timestamp that identifies the time bucket it falls in
+time_buckets = {"month": 7, "day": 10, "hour": 13, "minute": 16}
+
+# the comparisons that can follow a field name in a filter, such as ``id__gt``, with their SQL and Python operators
+comparisons = {"gt": (">", operator.gt), "ge": (">=", operator.ge), "lt": ("<", operator.lt),
+               "le": ("<=", operator.le)}
+
+# an SQL condition that holds when the observed value of an observation is a number
+_numeric_observed_value = "row.observed_value not glob '*[^0-9.eE+-]*' and row.observed_value glob '*[0-9]*'"
+
+
+def _bindings_of_verdict_rows(rows):
+    # give the bindings of a list of verdict rows, loaded at once
+    return bindings(list(set(row["binding"] for row in rows)))
+
+
+def _related_to_observation_rows(rows):
+    # give the verdicts of a list of observation rows, and the bindings of those verdicts, loaded at once
+    related = verdicts(list(set(row["verdict"] for row in rows)))
+    return related + bindings(list(set(v.binding for v in related)))
+
+
+class _Model(object):
+    """
+    Describes how to query one ORM class: the table and columns it is stored in, the column ``time_between``
+    filters on, filters that are derived from other tables, and the end-points that can answer queries for it.
+    """
+
+    def __init__(self, table, columns, construct, time_column, derived_filters, end_points, joins=(),
+                 group_keys=None, load_related=None):
+        self.table = table
+        self.columns = columns
+        self.construct = construct
+        self.time_column = time_column
+        # map filter names to a pair (SQL condition, function giving the value of the filter for a row)
+        self.derived_filters = derived_filters
+        # triples (filters answered, end-point, whether the end-point gives a single row), most selective first
+        self.end_points = end_points
+        # joins from the rows of a query, named row, to the tables that group keys refer to
+        self.joins = joins
+        # map group key names to a pair (SQL expression, function giving the key for a row)
+        self.group_keys = group_keys or {}
+        # function that loads the objects that derived filters and group keys refer to for a list of rows at once
+        self.load_related = load_related
+
+
+_models = {
+    Function: _Model(
+        "function", ("id", "fully_qualified_name"),
+        lambda d: Function(d["id"], d["fully_qualified_name"]), None, {},
+        [
+            (("id",), 'client/function/id/%(id)d/', True),
+            (("fully_qualified_name",), 'client/function/name/%(fully_qualified_name)s/', False),
+            ((), 'client/function/', False)
+        ]
+    ),
+    FunctionCall: _Model(
+        "function_call", ("id", "function", "time_of_call", "end_time_of_call", "trans", "path_condition_id_sequence"),
+        _function_call_from_row, "time_of_call", {},
+        [
+            (("id",), 'client/function_call/id/%(id)d/', True),
+            (("trans",), 'client/transaction/id/%(trans)d/function_calls/', False),
+            (("function",), 'client/function/id/%(function)d/function_calls/', False)
+        ],
+        group_keys={
+            "function": ("row.function", lambda d: d["function"]),
+            "transaction": ("row.trans", lambda d: d["trans"])
+        }
+    ),
+    Verdict: _Model(
+        "verdict", ("id", "binding", "verdict", "time_obtained", "function_call", "collapsing_atom",
+                    "collapsing_atom_sub_index"),
+        _verdict_from_row, "time_obtained",
+        {
+            "property": ("binding in (select id from binding where property_hash = ?)",
+                         lambda d: binding(d["binding"]).property_hash)
+        },
+        [
+            (("id",), 'client/verdict/id/%(id)d/', True),
+            (("function_call", "verdict", "property"),
+             'client/function_call/id/%(function_call)d/verdict/value/%(verdict)d/hash/%(property)s/', False),
+            (("function_call", "property"), 'client/function_call/id/%(function_call)d/hash/%(property)s/verdicts/',
+             False),
+            (("function_call", "verdict"), 'client/function_call/id/%(function_call)d/verdict/value/%(verdict)d/',
+             False),
+            (("function_call",), 'client/function_call/id/%(function_call)d/verdicts/', False),
+            (("binding",), 'client/binding/id/%(binding)d/verdicts/', False)
+        ],
+        joins=("inner join binding on row.binding = binding.id",),
+        group_keys={
+            "binding": ("row.binding", lambda d: d["binding"]),
+            "function_call": ("row.function_call", lambda d: d["function_call"]),
+            "verdict": ("row.verdict", lambda d: d["verdict"]),
+            "atom": ("row.collapsing_atom", lambda d: d["collapsing_atom"]),
+            "property": ("binding.property_hash", lambda d: binding(d["binding"]).property_hash),
+            "function": ("binding.function", lambda d: binding(d["binding"]).function)
+        },
+        load_related=_bindings_of_verdict_rows
+    ),
+    Observation: _Model(
+        "observation", ("id", "instrumentation_point", "verdict", "observed_value", "observation_time",
+                        "observation_end_time", "atom_index", "sub_index", "previous_condition_offset"),
+        _observation_from_row, "observation_time",
+        {
+            "function_call": ("verdict in (select id from verdict where function_call = ?)",
+                              lambda d: verdict(d["verdict"]).function_call)
+        },
+        [
+            (("id",), 'client/observation/id/%(id)d/', True),
+            (("verdict",), 'client/verdict/id/%(verdict)d/observations/', False),
+            (("function_call",), 'client/function_call/id/%(function_call)d/observations/', False),
+            (("instrumentation_point",), 'client/instrumentation_point/id/%(instrumentation_point)d/observations/',
+             False)
+        ],
+        joins=("inner join verdict on row.verdict = verdict.id", "inner join binding on verdict.binding = binding.id"),
+        group_keys={
+            "instrumentation_point": ("row.instrumentation_point", lambda d: d["instrumentation_point"]),
+            "verdict": ("row.verdict", lambda d: d["verdict"]),
+            "atom": ("row.atom_index", lambda d: d["atom_index"]),
+            "function_call": ("verdict.function_call", lambda d: verdict(d["verdict"]).function_call),
+            "binding": ("verdict.binding", lambda d: verdict(d["verdict"]).binding),
+            "property": ("binding.property_hash", lambda d: binding(verdict(d["verdict"]).binding).property_hash),
+            "function": ("binding.function", lambda d: binding(verdict(d["verdict"]).binding).function)
+        },
+        load_related=_related_to_observation_rows
+    )
+}
+
+
+def _numeric_value(row):
+    # give the observed value of an observation as a float, or None if it is not a number
+    value = _float_or_nan(row["observed_value"])
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+def _percentile(values, percentile):
+    """Give the nearest-rank ``percentile`` of the sorted list ``values``."""
+    return values[max(0, int(math.ceil(percentile / 100.0 * len(values))) - 1)]
+
+
+def _split_filter(name):
+    """
+    Give the field a filter named ``name`` applies to, and its comparison or None if the filter is an equality.
+    """
+    (field, separator, comparison) = name.partition("__")
+    return (field, comparison or None)
+
+
+def _filter_value(value):
+    """
+    Give the value stored in the database for a filter value given to a query, which may be an ORM object.
+    """
+    if isinstance(value, Property):
+        return value.hash
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if hasattr(value, "id"):
+        return value.id
+    return value
+
+
+class Query(object):
+    """
+    A query for instances of one ORM class.  Queries are immutable; ``filter``, ``order_by`` and ``limit``
+    each give a new query, so a query can be refined without changing the original.
+    """
+
+    def __init__(self, cls, filters=None, time_between=None, ordering=None, maximum=None, grouping=()):
+        if cls not in _models:
+            raise ValueError("cannot query %s objects" % cls.__name__)
+        self._cls = cls
+        self._model = _models[cls]
+        self._filters = filters or {}
+        self._time_between = time_between
+        self._ordering = ordering
+        self._maximum = maximum
+        self._grouping = grouping
+
+    def __repr__(self):
+        return "<%s %s filters=%s, time_between=%s, order_by=%s, limit=%s, group_by=%s>" % \
+               (
+                   self.__class__.__name__,
+                   self._cls.__name__,
+                   self._filters,
+                   self._time_between,
+                   self._ordering,
+                   self._maximum,
+                   self._grouping
+               )
+
+    def _copy(self, **changes):
+        arguments = {"filters": self._filters, "time_between": self._time_between, "ordering": self._ordering,
+                     "maximum": self._maximum, "grouping": self._grouping}
+        arguments.update(changes)
+        return Query(self._cls, **arguments)
+
+    def filter(self, time_between=None, **filters):
+        """
+        Give a query for the objects that also have the given value for each field named, for example
+        ``filter(binding=3, verdict=0)``.  Values can be ORM objects, in which case their ID is used.
+        A field name can be followed by ``__gt``, ``__ge``, ``__lt`` or ``__le`` to keep only objects whose value
+        for the field is greater than, at least, less than or at most the value given, for example ``id__gt=100``.
+        ``time_between`` is a pair of times, and keeps only objects whose time field is between them.
+        """
+        for name in filters:
+            (field, comparison) = _split_filter(name)
+            if comparison is not None:
+                if comparison not in comparisons or field not in self._model.columns:
+                    raise ValueError("%s objects cannot be filtered by '%s'" % (self._cls.__name__, name))
+            elif field not in self._model.columns and field not in self._model.derived_filters:
+                raise ValueError("%s objects cannot be filtered by '%s'" % (self._cls.__name__, name))
+        if time_between is not None and self._model.time_column is None:
+            raise ValueError("%s objects have no time to filter by" % self._cls.__name__)
+        new_filters = dict(self._filters)
+        new_filters.update((name, _filter_value(value)) for (name, value) in filters.items())
+        if time_between is not None:
+            time_between = (_filter_value(time_between[0]), _filter_value(time_between[1]))
+        return self._copy(filters=new_filters, time_between=time_between or self._time_between)
+
+    def order_by(self, column):
+        """
+        Give a query whose results are ordered by ``column``, in descending order if it starts with ``-``.
+        """
+        if column.lstrip("-") not in self._model.columns:
+            raise ValueError("%s objects cannot be ordered by '%s'" % (self._cls.__name__, column))
+        return self._copy(ordering=column)
+
+    def limit(self, n):
+        """Give a query for at most ``n`` of the objects this query gives."""
+        return self._copy(maximum=n)
+
+    def group_by(self, *keys):
+        """
+        Give a query whose summaries, such as ``count``, are given for each group of objects with the same values
+        for ``keys``.  Keys can be related objects, such as ``"binding"`` or ``"property"`` for verdicts, or one of
+        ``"month"``, ``"day"``, ``"hour"`` or ``"minute"`` to group by the time of each object.
+        """
+        for key in keys:
+            if key not in self._model.group_keys and not (key in time_buckets and self._model.time_column):
+                raise ValueError("%s objects cannot be grouped by '%s'" % (self._cls.__name__, key))
+        return self._copy(grouping=tuple(keys))
+
+    def count(self):
+        """
+        Give the number of objects this query gives.  If the query is grouped, give a list with a dictionary
+        for each group, holding the values of the keys and ``count``.
+        """
+        summaries = self._summarise(
+            ["count(*) as count"], None,
+            lambda: 0, lambda count, row: count + 1, lambda count: {"count": count}
+        )
+        if not self._grouping:
+            return summaries[0][1]["count"] if summaries else 0
+        return self._grouped(summaries)
+
+    def failure_ratio(self):
+        """
+        Give a dictionary holding the number of verdicts this query gives as ``count``, the number of them that
+        are False as ``failures``, and the proportion of them that are False as ``failure_ratio``.
+        If the query is grouped, give a list with such a dictionary for each group, also holding the values
+        of the keys.
+        """
+        if self._cls is not Verdict:
+            raise ValueError("failure ratios can only be given for verdicts")
+
+        def finish(counts):
+            (count, failures) = counts
+            return {"count": count, "failures": failures,
+                    "failure_ratio": float(failures) / count if count > 0 else None}
+
+        summaries = self._summarise(
+            ["count(*) as count", "coalesce(sum(row.verdict = 0), 0) as failures"], None,
+            lambda: (0, 0), lambda counts, row: (counts[0] + 1, counts[1] + (row["verdict"] == 0)), finish,
+            lambda summary: finish((summary["count"], summary["failures"]))
+        )
+        if not self._grouping:
+            return summaries[0][1] if summaries else finish((0, 0))
+        return self._grouped(summaries)
+
+    def observed_value_stats(self, percentiles=()):
+        """
+        Give a dictionary holding the ``count``, ``min``, ``max`` and ``mean`` of the numeric observed values of
+        the observations this query gives, along with each percentile in ``percentiles`` under keys such as
+        ``p95``.  If the query is grouped, give a list with such a dictionary for each group, also holding
+        the values of the keys.
+        """
+        if self._cls is not Observation:
+            raise ValueError("observed value statistics can only be given for observations")
+
+        def accumulate(values, row):
+            value = _numeric_value(row)
+            if value is not None:
+                values.append(value)
+            return values
+
+        def finish(values):
+            values.sort()
+            summary = {"count": len(values), "min": values[0] if values else None,
+                       "max": values[-1] if values else None,
+                       "mean": sum(values) / len(values) if values else None}
+            for percentile in percentiles:
+                summary["p%s" % percentile] = _percentile(values, percentile) if values else None
+            return summary
+
+        value = "cast(row.observed_value as real)"
+        summaries = self._summarise(
+            ["count(*) as count", "min(%s) as min" % value, "max(%s) as max" % value, "avg(%s) as mean" % value],
+            _numeric_observed_value, list, accumulate, finish
+        )
+        connection = get_connection()
+        if percentiles and isinstance(connection, VerdictDatabaseConnection):
+            # SQLite has no percentile aggregate, so read the values of each group in order and pick them out
+            values_sql = self._aggregate_sql(["%s as value" % value], _numeric_observed_value, order_by_value=True)
+            percentiles_of_group = {}
+            for (key, group) in itertools.groupby(connection.rows(*values_sql), self._group_of_row):
+                group_values = [row["value"] for row in group]
+                percentiles_of_group[key] = dict(("p%s" % percentile, _percentile(group_values, percentile))
+                                                 for percentile in percentiles)
+            for (key, summary) in summaries:
+                summary.update(percentiles_of_group.get(
+                    key, dict(("p%s" % percentile, None) for percentile in percentiles)
+                ))
+        if not self._grouping:
+            return summaries[0][1] if summaries else finish([])
+        return self._grouped(summaries)
+
+    def _key_sql(self, key):
+        if key in time_buckets:
+            return "substr(row.%s, 1, %i)" % (self._model.time_column, time_buckets[key])
+        return self._model.group_keys[key][0]
+
+    def _key_of_row(self, key, row):
+        if key in time_buckets:
+            return row[self._model.time_column][:time_buckets[key]]
+        return self._model.group_keys[key][1](row)
+
+    def _group_of_row(self, row):
+        # give the values of the keys in a row of an aggregate query
+        return tuple(row["key_%i" % n] for n in range(len(self._grouping)))
+
+    def _grouped(self, summaries):
+        results = []
+        for (key, summary) in summaries:
+            result = dict(zip(self._grouping, key))
+            result.update(summary)
+            results.append(result)
+        return results
+
+    def _aggregate_sql(self, aggregates, condition, order_by_value=False):
+        """
+        Give a pair ``(query, parameters)`` with the SQL query that gives ``aggregates`` over the rows this query
+        gives that satisfy ``condition``, with a row for each group.  If ``order_by_value`` is True, the rows are
+        not aggregated, but are ordered by group and then by the column ``value``.
+        """
+        (sql, parameters) = self.to_sql()
+        keys = ["%s as key_%i" % (self._key_sql(key), n) for (n, key) in enumerate(self._grouping)]
+        key_names = ["key_%i" % n for n in range(len(self._grouping))]
+        aggregate_sql = "select %s from (%s) as row %s" % \
+                        (", ".join(keys + aggregates), sql, " ".join(self._model.joins))
+        if condition:
+            aggregate_sql += " where %s" % condition
+        if order_by_value:
+            aggregate_sql += " order by %s" % ", ".join(key_names + ["value"])
+        elif key_names:
+            aggregate_sql += " group by %s order by %s" % (", ".join(key_names), ", ".join(key_names))
+        return (aggregate_sql, parameters)
+
+    def _summarise(self, aggregates, condition, initial, accumulate, finish, from_sql=None):
+        """
+        Give a list of pairs ``(key, summary)``, with a summary of the objects in each group this query gives.
+
+        With a local database, the SQL ``aggregates`` are computed over the rows satisfying ``condition``,
+        and ``from_sql`` converts the aggregates of each group to its summary.  With a verdict server, each row
+        is folded into the state of its group with ``accumulate``, starting from ``initial()``, and ``finish``
+        converts the final state of each group to its summary.
+        """
+        connection = get_connection()
+        if isinstance(connection, VerdictDatabaseConnection):
+            summaries = []
+            for row in connection.rows(*self._aggregate_sql(aggregates, condition)):
+                key = self._group_of_row(row)
+                summary = dict((name, value) for (name, value) in row.items() if not name.startswith("key_"))
+                summaries.append((key, from_sql(summary) if from_sql else summary))
+            return summaries
+        states = {}
+        for row in self._rows_from_server(connection):
+            key = tuple(self._key_of_row(name, row) for name in self._grouping)
+            states[key] = accumulate(states[key] if key in states else initial(), row)
+        return [(key, finish(states[key])) for key in sorted(states)]
+
+    def __iter__(self):
+        for row in self.rows():
+            yield self._model.construct(row)
+
+    def rows(self):
+        """
+        Give an iterable over the rows this query gives, each a dictionary mapping columns to values,
+        without making them into objects.
+        """
+        connection = get_connection()
+        if isinstance(connection, VerdictDatabaseConnection):
+            (sql, parameters) = self.to_sql()
+            return connection.rows(sql, parameters)
+        return self._rows_from_server(connection)
+
+    def all(self):
+        """Give a list of the objects this query gives."""
+        return list(self)
+
+    def first(self):
+        """Give the first object this query gives, or None if there are none."""
+        return next(iter(self.limit(1)), None)
+
+    def to_sql(self):
+        """
+        Give a pair ``(query, parameters)`` with the SQL query that answers this query on a verdict database.
+        """
+        conditions = []
+        parameters = []
+        for (name, value) in sorted(self._filters.items()):
+            (field, comparison) = _split_filter(name)
+            if name in self._model.derived_filters:
+                conditions.append(self._model.derived_filters[name][0])
+            elif comparison is not None:
+                conditions.append("%s %s ?" % (field, comparisons[comparison][0]))
+            else:
+                conditions.append("%s = ?" % name)
+            parameters.append(value)
+        if self._time_between is not None:
+            conditions.append("%s between ? and ?" % self._model.time_column)
+            parameters += list(self._time_between)
+        sql = "select * from %s" % self._model.table
+        if conditions:
+            sql += " where %s" % " and ".join(conditions)
+        column = (self._ordering or "id").lstrip("-")
+        sql += " order by %s%s" % (column, " desc" if (self._ordering or "").startswith("-") else "")
+        if self._maximum is not None:
+            sql += " limit %i" % self._maximum
+        return (sql, parameters)
+
+    def _end_point(self):
+        """
+        Give the most selective end-point for the filters of this query, with the names of the filters it applies
+        and whether it gives a single row.
+        """
+        for (names, end_point, single) in self._model.end_points:
+            if all(name in self._filters for name in names):
+                return (end_point % self._filters, names, single)
+        raise ValueError("a %s query needs a filter on one of %s when using a verdict server" %
+                         (self._cls.__name__,
+                          ", ".join(sorted(set(names[0] for (names, end_point, single) in self._model.end_points)))))
+
+    def _matches(self, row, applied):
+        for (name, value) in self._filters.items():
+            if name in applied:
+                continue
+            (field, comparison) = _split_filter(name)
+            if name in self._model.derived_filters:
+                if self._model.derived_filters[name][1](row) != value: return False
+            elif comparison is not None:
+                # as in SQL, a missing value satisfies no comparison
+                if row[field] is None or not comparisons[comparison][1](row[field], value): return False
+            elif row[name] != value:
+                return False
+        if self._time_between is not None:
+            time = row[self._model.time_column]
+            if not self._time_between[0] <= time <= self._time_between[1]: return False
+        return True
+
+    def _uses_related(self, applied):
+        # decide whether checking filters or finding group keys for rows from the server needs related objects
+        return (any(name in self._model.derived_filters and name not in applied for name in self._filters) or
+                any(key in self._model.group_keys and not self._model.group_keys[key][0].startswith("row.")
+                    for key in self._grouping))
+
+    def _with_related(self, rows):
+        # load related objects for a page of rows at a time, rather than requesting them one row at a time
+        while True:
+            page = list(itertools.islice(rows, default_page_size))
+            if not page:
+                return
+            # the identity map only holds objects weakly, so the related objects are held here until every row
+            # of the page has been checked and grouped, which finds them in the identity map rather than requesting them
+            related = self._model.load_related(page)
+            for row in page:
+                yield row
+            del related
+
+    def _rows_from_server(self, connection):
+        (end_point, applied, single) = self._end_point()
+        if single:
+            row = connection.fetch(end_point)
+            rows = [] if row is None else [row]
+        else:
+            rows = connection.stream(end_point)
+        if self._model.load_related is not None and self._uses_related(applied):
+            rows = self._with_related(iter(rows))
+        rows = (row for row in rows if self._matches(row, applied))
+        if self._ordering is not None:
+            column = self._ordering.lstrip("-")
+            rows = sorted(rows, key=lambda row: row[column], reverse=self._ordering.startswith("-"))
+        if self._maximum is not None:
+            rows = itertools.islice(rows, self._maximum)
+        return rows
+
+
+def query(cls):
+    """
+    Give a query for all instances of ``cls``, which can be ``Function``, ``FunctionCall``, ``Verdict``
+    or ``Observation``.  For example,
+
+    ``va.query(va.Verdict).filter(binding=3, verdict=0).order_by("-time_obtained").limit(10)``
+
+    gives the ten most recent False verdicts for the binding with ID 3.
+    """
+    return Query(cls)
@@ -2,175 +2,836 @@
 Module for path reconstruction in the analysis library.
 """
 
+from collections import OrderedDict
+from array import array
+import multiprocessing
+import threading
+import weakref
 import pickle
 
+from VyPRAnalysis import get_reconstruction_processes
 
-def edges_from_condition_sequence(scfg, path_subchain, instrumentation_point_path_length):
+
+# the kinds of vertex that path reconstruction tells apart, in the order they are tested for
+_kind_conditional = 0
+_kind_loop = 1
+_kind_try_catch = 2
+_kind_loop_end = 3
+_kind_post_conditional = 4
+_kind_post_try_catch = 5
+_kind_other = 6
+
+# the most prefixes of condition sequences each graph remembers the traversal of
+max_trie_nodes = 100000
+
+# the transition table used by each worker process of paths_from_condition_sequences
+_worker_table = None
+
+# transition tables compiled so far, held for as long as their graph is
+_tables = weakref.WeakKeyDictionary()
+_tables_lock = threading.Lock()
+
+
+def _first_edge(edges, test):
+    for (n, edge) in edges:
+        if test(edge._condition):
+            return n
+    return None
+
+
+def _no_edge(vertex):
+    return IndexError("vertex %s has no outgoing edge to follow" % vertex)
+
+
+def _array_bytes(numbers):
+    return numbers.tobytes() if hasattr(numbers, "tobytes") else numbers.tostring()
+
+
+def _array_from_bytes(data):
+    numbers = array("I")
+    if hasattr(numbers, "frombytes"):
+        numbers.frombytes(data)
+    else:
+        numbers.fromstring(data)
+    return numbers
+
+
+def _encoded_path_from_bytes(data):
+    return EncodedPath(_array_from_bytes(data))
+
+
+class EncodedPath(object):
     """
-    Given a Symbolic Control-Flow Graph ``scfg``, a path subchain and a path length, reconstruct a program execution
-    path as a sequence of edges from a Symbolic Control-Flow Graph.
+    A path through a Symbolic Control-Flow Graph, stored compactly as the numbers of its elements in the graph's
+    ``TransitionTable``.  It behaves as a sequence of edges, each of which is only looked up when it's used.
+
+    Encoded paths are compared and hashed by their numbers, so paths through different graphs should not be mixed.
+    Only the numbers are pickled, so an encoded path sent to another process must be given a table again with
+    ``bind`` before its edges are used.
+    """
+
+    __slots__ = ("numbers", "_table", "_hash")
+
+    def __init__(self, numbers, table=None):
+        self.numbers = numbers if isinstance(numbers, array) and numbers.typecode == "I" else array("I", numbers)
+        self._table = table
+        self._hash = None
+
+    def __repr__(self):
+        if self._table is None:
+            return "<%s length=%i>" % (self.__class__.__name__, len(self.numbers))
+        return repr(self.decode())
+
+    def __reduce__(self):
+        return (_encoded_path_from_bytes, (self.key(),))
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def _elements(self):
+        if self._table is None:
+            raise ValueError("encoded path has no transition table to look its edges up in")
+        return self._table.elements
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return EncodedPath(self.numbers[index], self._table)
+        return self._elements()[self.numbers[index]]
+
+    def __iter__(self):
+        elements = self._elements()
+        for n in self.numbers:
+            yield elements[n]
+
+    def __eq__(self, other):
+        if isinstance(other, EncodedPath):
+            return self.numbers == other.numbers
+        return self.decode() == list(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(self.key())
+        return self._hash
+
+    def key(self):
+        """
+        Give the numbers of the path as a byte string, which is equal for equal paths through the same graph.
+        """
+        return _array_bytes(self.numbers)
+
+    def startswith(self, prefix):
+        """
+        Give whether the encoded path ``prefix`` is a prefix of this path.
+        """
+        return len(prefix.numbers) <= len(self.numbers) and self.numbers[:len(prefix.numbers)] == prefix.numbers
+
+    def bind(self, table):
+        """
+        Look the edges of this path up in ``table`` from now on, and give this path.
+        """
+        self._table = table
+        return self
+
+    def decode(self):
+        """
+        Give the path as a list of edges.
+        """
+        return list(self)
+
+
+def _tokens_length(tokens):
+    return sum(_tokens_length(token[0]) * token[1] if type(token) is tuple else 1 for token in tokens)
+
+
+def _token_at(tokens, index):
+    # give the element number at ``index`` in the expansion of ``tokens``, without expanding them
+    for token in tokens:
+        if type(token) is tuple:
+            (body, count) = token
+            body_length = _tokens_length(body)
+            if index < body_length * count:
+                return _token_at(body, index % body_length)
+            index -= body_length * count
+        elif index == 0:
+            return token
+        else:
+            index -= 1
+    raise IndexError("run-length path index out of range")
+
+
+def _expand_tokens(tokens):
+    for token in tokens:
+        if type(token) is tuple:
+            (body, count) = token
+            for i in range(count):
+                for n in _expand_tokens(body):
+                    yield n
+        else:
+            yield token
+
+
+class _RunLengthBuilder(object):
+    """
+    Receives the numbers of the elements of a path one at a time, and gives them as run-length encoded tokens,
+    in which consecutive identical iterations of a loop are stored once along with how many there were.
     """
-    #print("reconstruction with path subchain %s" % str(path_subchain))
-    condition_index = 0
-    curr = scfg.starting_vertices
-    #path = [curr]
-    path = []
-    cumulative_conditions = []
-    while condition_index < len(path_subchain):
-        #path.append(curr)
-        #print(curr._name_changed)
-        if len(curr.edges) > 1:
-            # more than 1 outgoing edges means we have a branching point
-
-            #TODO: need to handle parameters in condition sequences
-            if path_subchain[condition_index] == "parameter":
-                if curr._name_changed == ["conditional"]:
-                    # add the vertex to the path, skip past the construct
-                    # and increment the condition index
-                    path.append(curr)
-                    curr = curr.post_conditional_vertex
-                    condition_index += 1
-                    continue
-
-            # we have to decide whether it's a loop or a conditional
-            if curr._name_changed == ["conditional"]:
-                #print("traversing conditional %s with condition %s" % (curr, path_subchain[condition_index]))
-                # path_subchain[condition_index] is the index of the branch to follow if we're dealing with a conditional
-                path.append(curr.edges[int(path_subchain[condition_index])])
-                curr = curr.edges[int(path_subchain[condition_index])]._target_state
-                condition_index += 1
-            elif curr._name_changed == ["loop"]:
-                #print("traversing loop %s with condition %s" % (curr, path_subchain[condition_index]))
-                if path_subchain[condition_index] == "enter-loop":
-                    #print("finding edge entering the loop")
-                    # condition isn't a negation, so follow the edge leading into the loop
-                    for edge in curr.edges:
-                        #print(edge._condition)
-                        if edge._condition == ["enter-loop"]:
-                            #print("traversing edge with positive loop condition")
-                            cumulative_conditions.append("for")
-                            # follow this edge
-                            curr = edge._target_state
-                            path.append(edge)
-                            break
-                    # make sure the next branching point consumes the next condition in the chain
-                    condition_index += 1
+
+    def __init__(self, table):
+        self._arrivals = table._loop_arrivals
+        self._exits = table._loop_exits
+        self._edge_count = len(table.edges)
+        self._tokens = []
+        # the loops the path is in, innermost last, each as
+        # [loop vertex, finished runs, body of the current run, repetitions of it, tokens of the current iteration]
+        self._loops = []
+
+    def _current(self):
+        return self._loops[-1][4] if self._loops else self._tokens
+
+    def _end_iteration(self, frame):
+        body = tuple(frame[4])
+        frame[4] = []
+        if body == frame[2]:
+            frame[3] += 1
+        else:
+            if frame[2] is not None:
+                frame[1].append((frame[2], frame[3]))
+            (frame[2], frame[3]) = (body, 1)
+
+    def _leave(self, loop):
+        # leave every loop up to and including ``loop``
+        while self._loops:
+            frame = self._loops.pop()
+            if frame[2] is not None:
+                frame[1].append((frame[2], frame[3]))
+            outside = self._current()
+            for (body, count) in frame[1]:
+                if count == 1:
+                    outside.extend(body)
                 else:
-                    #print("finding edge skipping the loop")
-                    # go straight past the loop
-                    for edge in curr.edges:
-                        if edge._condition == ["end-loop"]:
-                            #print("traversing edge with negative loop condition")
-                            cumulative_conditions.append(edge._condition)
-                            # follow this edge
-                            curr = edge._target_state
-                            path.append(edge)
-                            break
-                    # make sure the next branching point consumes the next condition in the chain
-                    condition_index += 1
-            elif curr._name_changed == ["try-catch"]:
-                #print("traversing try-catch")
-                # for now assume that we immediately traverse the no-exception branch
-                #print(curr)
-                # search the outgoing edges for the edge leading to the main body
-                for edge in curr.edges:
-                    #print("testing edge with condition %s against cumulative condition %s" %\
-                    #		(edge._condition, cumulative_conditions + [path_subchain[condition_index]]))
-                    if edge._condition[-1] == "try-catch-main":
-                        #print("traversing edge with condition %s" % edge._condition)
-                        curr = edge._target_state
-                        path.append(edge)
-                        cumulative_conditions.append(edge._condition[-1])
-                        break
-                condition_index += 1
+                    outside.append((body, count))
+            # an iteration that left the loop part way through isn't repeated
+            outside.extend(frame[4])
+            if frame[0] == loop:
+                return
+
+    def append(self, n):
+        self._current().append(n)
+        if n >= self._edge_count:
+            return
+        if self._exits[n] is not None and any(frame[0] == self._exits[n] for frame in self._loops):
+            self._leave(self._exits[n])
+        loop = self._arrivals[n]
+        if loop is not None:
+            if any(frame[0] == loop for frame in self._loops):
+                # back around a loop, leaving any loops inside it
+                while self._loops[-1][0] != loop:
+                    self._leave(self._loops[-1][0])
+                self._end_iteration(self._loops[-1])
             else:
-                # probably the branching point at the end of a loop - currently these aren't explicitly marked
-                # the behaviour here with respect to consuming branching conditions will be a bit different
-                if path_subchain[condition_index] == "enter-loop":
+                self._loops.append([loop, [], None, 0, []])
+
+    def extend(self, numbers):
+        for n in numbers:
+            self.append(n)
+
+    def tokens(self):
+        """
+        Give the tokens of the path received so far, leaving any loops it's still in.
+        """
+        if self._loops:
+            self._leave(self._loops[0][0])
+        return tuple(self._tokens)
+
+
+def _run_length_path_from_tokens(tokens):
+    return RunLengthPath(tokens)
+
+
+class RunLengthPath(object):
+    """
+    A path through a Symbolic Control-Flow Graph in which consecutive identical iterations of each loop are stored
+    once, along with the number of times they were repeated, so its size depends on the structure of the path rather
+    than on how many times its loops were iterated.
+
+    ``tokens`` holds the numbers of the elements of the path in the graph's ``TransitionTable``, with each run of
+    iterations given by a pair ``(tokens of one iteration, number of iterations)``.  As with ``EncodedPath``, the path
+    behaves as a sequence of edges that are only looked up when used, and only the tokens are pickled.
+    """
+
+    __slots__ = ("tokens", "_table", "_hash", "_length")
+
+    def __init__(self, tokens, table=None):
+        self.tokens = tokens
+        self._table = table
+        self._hash = None
+        self._length = None
+
+    def __repr__(self):
+        return "<%s length=%i, tokens=%i>" % (self.__class__.__name__, len(self), len(self.tokens))
+
+    def __reduce__(self):
+        return (_run_length_path_from_tokens, (self.tokens,))
+
+    def __len__(self):
+        if self._length is None:
+            self._length = _tokens_length(self.tokens)
+        return self._length
+
+    def __iter__(self):
+        if self._table is None:
+            raise ValueError("run-length path has no transition table to look its edges up in")
+        elements = self._table.elements
+        for n in _expand_tokens(self.tokens):
+            yield elements[n]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.expand()[index]
+        if self._table is None:
+            raise ValueError("run-length path has no transition table to look its edges up in")
+        if index < 0:
+            index += len(self)
+        if index < 0:
+            raise IndexError("run-length path index out of range")
+        return self._table.elements[_token_at(self.tokens, index)]
+
+    def __eq__(self, other):
+        if isinstance(other, RunLengthPath):
+            return self.tokens == other.tokens
+        return self.decode() == list(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(self.tokens)
+        return self._hash
+
+    def key(self):
+        """
+        Give a value that is equal for equal paths through the same graph.
+        """
+        return self.tokens
+
+    def bind(self, table):
+        """
+        Look the edges of this path up in ``table`` from now on, and give this path.
+        """
+        self._table = table
+        return self
+
+    def expand(self):
+        """
+        Give this path as an ``EncodedPath``, with every iteration of its loops written out.
+        """
+        return EncodedPath(array("I", _expand_tokens(self.tokens)), self._table)
+
+    def decode(self):
+        """
+        Give the path as a list of edges.
+        """
+        return list(self)
+
+
+class TransitionTable(object):
+    """
+    A Symbolic Control-Flow Graph compiled into flat tables, so that reconstructing a path takes one lookup
+    per step.
+
+    Edges are numbered in the order they're reached by a breadth-first traversal from the starting vertex,
+    so the numbering is the same every time a given graph is compiled.  Reconstructed paths are given as lists
+    of numbers indexing ``elements``, which holds every edge followed by every vertex.
+    """
+
+    def __init__(self, scfg):
+        self._trie = None
+        self._element_numbers = None
+        self.vertices = []
+        self.edges = []
+        vertex_numbers = {}
+        edge_numbers = {}
+
+        def number(vertex):
+            if id(vertex) not in vertex_numbers:
+                vertex_numbers[id(vertex)] = len(self.vertices)
+                self.vertices.append(vertex)
+
+        number(scfg.starting_vertices)
+        n = 0
+        while n < len(self.vertices):
+            vertex = self.vertices[n]
+            for edge in vertex.edges:
+                edge_numbers[id(edge)] = len(self.edges)
+                self.edges.append(edge)
+                number(edge._target_state)
+            if getattr(vertex, "post_conditional_vertex", None) is not None:
+                number(vertex.post_conditional_vertex)
+            n += 1
+
+        self.elements = self.edges + self.vertices
+        self._targets = [vertex_numbers[id(edge._target_state)] for edge in self.edges]
+        self._kinds = []
+        # the edge followed from each vertex when there is nothing to choose between
+        self._first = []
+        # the edges chosen between at conditionals
+        self._branches = []
+        # the edges that enter or leave loops, and the edges into the main body of try-catch blocks
+        self._enter = []
+        self._leave = []
+        # the vertices after conditionals, for skipping past them when a path has a parameter
+        self._post_conditional = []
+        # whether moving on from a post-conditional or post-try-catch vertex consumes a condition
+        self._consumes = []
+        self._path_lengths = []
+        for vertex in self.vertices:
+            edges = [(edge_numbers[id(edge)], edge) for edge in vertex.edges]
+            kind = _kind_other
+            (enter, leave, consumes) = (None, None, False)
+            if len(edges) > 1:
+                if vertex._name_changed == ["conditional"]:
+                    kind = _kind_conditional
+                elif vertex._name_changed == ["loop"]:
+                    kind = _kind_loop
+                    enter = _first_edge(edges, lambda condition: condition == ["enter-loop"])
+                    leave = _first_edge(edges, lambda condition: condition == ["end-loop"])
+                elif vertex._name_changed == ["try-catch"]:
+                    kind = _kind_try_catch
+                    enter = _first_edge(edges, lambda condition: bool(condition) and condition[-1] == "try-catch-main")
+                else:
+                    # probably the branching point at the end of a loop - currently these aren't explicitly marked
+                    kind = _kind_loop_end
+                    enter = _first_edge(edges, lambda condition: condition == "loop-jump")
+                    leave = _first_edge(edges, lambda condition: condition == "post-loop")
+            elif vertex._name_changed == ["post-conditional"]:
+                kind = _kind_post_conditional
+                consumes = len(edges) > 0 and edges[0][1]._target_state._name_changed != ["post-conditional"]
+            elif vertex._name_changed == ["post-try-catch"]:
+                kind = _kind_post_try_catch
+                consumes = len(edges) > 0 and edges[0][1]._target_state._name_changed != ["post-try-catch"]
+            post_conditional_vertex = getattr(vertex, "post_conditional_vertex", None)
+            self._kinds.append(kind)
+            self._first.append(edges[0][0] if edges else None)
+            self._branches.append(tuple(n for (n, edge) in edges) if kind == _kind_conditional else None)
+            self._enter.append(enter)
+            self._leave.append(leave)
+            self._post_conditional.append(
+                vertex_numbers[id(post_conditional_vertex)] if post_conditional_vertex is not None else None
+            )
+            self._consumes.append(consumes)
+            self._path_lengths.append(getattr(vertex, "_path_length", None))
+        # the loop vertex each edge arrives at, and the loop vertex each edge leaves the loop of
+        self._loop_arrivals = [target if self._kinds[target] == _kind_loop else None for target in self._targets]
+        self._loop_exits = [None] * len(self.edges)
+        for (n, kind) in enumerate(self._kinds):
+            if kind == _kind_loop and self._leave[n] is not None:
+                self._loop_exits[self._leave[n]] = n
+            elif kind == _kind_loop_end and self._enter[n] is not None and self._leave[n] is not None:
+                loop = self._targets[self._enter[n]]
+                if self._kinds[loop] == _kind_loop:
+                    self._loop_exits[self._leave[n]] = loop
+
+    def __repr__(self):
+        return "<%s vertices=%i, edges=%i>" % (self.__class__.__name__, len(self.vertices), len(self.edges))
+
+    def _consume(self, curr, condition, append):
+        """
+        Traverse from vertex number ``curr`` until ``condition`` has been consumed, passing the number of each element
+        traversed to ``append``, and give the number of the vertex reached.
+        """
+        kinds = self._kinds
+        first = self._first
+        targets = self._targets
+        while True:
+            kind = kinds[curr]
+            if kind == _kind_other:
+                edge = first[curr]
+                if edge is None: raise _no_edge(self.vertices[curr])
+                append(edge)
+                curr = targets[edge]
+            elif kind == _kind_conditional:
+                if condition == "parameter":
+                    # add the vertex to the path and skip past the construct
+                    if self._post_conditional[curr] is None: raise _no_edge(self.vertices[curr])
+                    append(len(self.edges) + curr)
+                    return self._post_conditional[curr]
+                # the condition is the index of the branch to follow
+                edge = self._branches[curr][int(condition)]
+                append(edge)
+                return targets[edge]
+            elif kind == _kind_loop or kind == _kind_try_catch:
+                if kind == _kind_loop and condition != "enter-loop":
+                    edge = self._leave[curr]
+                else:
+                    edge = self._enter[curr]
+                if edge is None:
+                    return curr
+                append(edge)
+                return targets[edge]
+            elif kind == _kind_loop_end:
+                if condition == "enter-loop":
                     # go back to the start of the loop without consuming the condition
-                    #print("going back around the loop from last instruction")
-                    relevant_edge = list(filter(lambda edge : edge._condition == 'loop-jump', curr.edges))[0]
-                    curr = relevant_edge._target_state
-                    path.append(relevant_edge)
+                    edge = self._enter[curr]
+                    if edge is None: raise _no_edge(self.vertices[curr])
+                    append(edge)
+                    curr = targets[edge]
                 else:
-                    # go past the loop
-                    #print(curr.edges)
-                    #print("ending loop from last instruction")
-                    relevant_edge = list(filter(lambda edge : edge._condition == 'post-loop', curr.edges))[0]
-                    curr = relevant_edge._target_state
-                    path.append(relevant_edge)
-                    # consume the negative condition
-                    condition_index += 1
-
-            #print("condition index %i from condition chain length %i" % (condition_index, len(path_subchain)))
-        elif curr._name_changed == ["post-conditional"]:
-            #print("traversing post-conditional")
-            # check the next vertex - if it's also a post-conditional, we move to that one but don't consume the condition
-            # if the next vertex isn't a post-conditional, we consume the condition and move to it
-            if curr.edges[0]._target_state._name_changed != ["post-conditional"]:
-                # consume the condition
-                condition_index += 1
-            path.append(curr.edges[0])
-            curr = curr.edges[0]._target_state
-            #print("resulting state after conditional is %s" % curr)
-            #print("condition index %i from condition chain length %i" % (condition_index, len(path_subchain)))
-        elif curr._name_changed == ["post-loop"]:
-            #print("traversing post-loop")
-            # condition is consumed when branching at the end of the loop is detected, so no need to do it here
-            #print("adding %s outgoing from %s to path" % (curr.edges[0], curr))
-            path.append(curr.edges[0])
-            curr = curr.edges[0]._target_state
-            #print("condition index %i from condition chain length %i" % (condition_index, len(path_subchain)))
-        elif curr._name_changed == ["post-try-catch"]:
-            #print("traversing post-try-catch", curr.edges)
-            #print(path_subchain[condition_index])
-            if len(curr.edges) > 0 and curr.edges[0]._target_state._name_changed != ["post-try-catch"]:
-                # consume the condition
-                condition_index += 1
-                path.append(curr.edges[0])
-                curr = curr.edges[0]._target_state
-            elif len(curr.edges) == 0:
-                # consume the condition
-                condition_index += 1
-            #print("condition index %i from condition chain length %i" % (condition_index, len(path_subchain)))
+                    # go past the loop, consuming the negative condition
+                    edge = self._leave[curr]
+                    if edge is None: raise _no_edge(self.vertices[curr])
+                    append(edge)
+                    return targets[edge]
+            elif kind == _kind_post_conditional:
+                edge = first[curr]
+                if edge is None: raise _no_edge(self.vertices[curr])
+                append(edge)
+                if self._consumes[curr]:
+                    return targets[edge]
+                curr = targets[edge]
+            else:
+                if first[curr] is None:
+                    return curr
+                elif self._consumes[curr]:
+                    append(first[curr])
+                    return targets[first[curr]]
+
+    def _finish(self, curr, consumed_conditions, instrumentation_point_path_length, append):
+        """
+        Traverse the remainder of a path from vertex number ``curr``, once its conditions have been consumed.
+        """
+        first = self._first
+        targets = self._targets
+        # traverse the remainder of the branch using the path length of the instrumentation point
+        # that generated the observation we're looking at
+        if instrumentation_point_path_length != -1:
+            # the length here needs to be changed depending on what the most recent construct the graph encountered was
+            # or we need to move the vertex back one in the case that it advanced "too far".
+            offset = -1 if self._path_lengths[curr] == 1 else 0
+            limit = (instrumentation_point_path_length + offset) if consumed_conditions \
+                else instrumentation_point_path_length
+            for i in range(limit):
+                edge = first[curr]
+                if edge is None: raise _no_edge(self.vertices[curr])
+                append(edge)
+                curr = targets[edge]
         else:
-            #print("no branching at %s" % curr)
-            path.append(curr.edges[0])
-            curr = curr.edges[0]._target_state
-            #print("condition index %i from condition chain length %i" % (condition_index, len(path_subchain)))
-
-    #print("finishing path traversal with path length %i" % instrumentation_point_path_length)
-
-    # traverse the remainder of the branch using the path length of the instrumentation point
-    # that generated the observation we're looking at
-    # print("starting remainder of traversal from vertex %s" % curr)
-    if instrumentation_point_path_length != -1:
-        # the length here needs to be changed depending on what the most recent construct the graph encountered was
-        # or we need to move the vertex back one in the case that it advanced "too far".
-        offset = -1 if curr._path_length == 1 else 0
-        limit = (instrumentation_point_path_length + offset) if len(path_subchain) > 0 else instrumentation_point_path_length
-        for i in range(limit):
-            #path.append(curr)
-            path.append(curr.edges[0])
-            curr = curr.edges[0]._target_state
-    else:
-        # we're reconstructing a complete path through the SCFG, so go until we get to a final state
-        while len(curr.edges) > 0:
-            path.append(curr.edges[0])
-            curr = curr.edges[0]._target_state
+            # we're reconstructing a complete path through the SCFG, so go until we get to a final state
+            while first[curr] is not None:
+                append(first[curr])
+                curr = targets[first[curr]]
+
+    def reconstruct(self, path_subchain, instrumentation_point_path_length):
+        """
+        Reconstruct a program execution path from a path subchain and a path length, as in
+        ``edges_from_condition_sequence``, giving the numbers of the elements of the path.
+        """
+        path = []
+        curr = 0
+        for condition in path_subchain:
+            curr = self._consume(curr, condition, path.append)
+        self._finish(curr, len(path_subchain) > 0, instrumentation_point_path_length, path.append)
+        return path
+
+    def encode(self, path):
+        """
+        Give ``path``, a list of edges through the graph of this table, as an ``EncodedPath``.
+        """
+        if isinstance(path, EncodedPath):
+            return path
+        return EncodedPath(self.element_numbers(path), self)
+
+    def run_length(self, path):
+        """
+        Give ``path``, a list of edges or an ``EncodedPath`` through the graph of this table, as a ``RunLengthPath``.
+        """
+        if isinstance(path, RunLengthPath):
+            return path
+        builder = _RunLengthBuilder(self)
+        builder.extend(path.numbers if isinstance(path, EncodedPath) else self.element_numbers(path))
+        return RunLengthPath(builder.tokens(), self)
+
+    def element_numbers(self, path):
+        """
+        Give the numbers of the edges and vertices in ``path``, so that ``to_path`` gives ``path`` back.
+        """
+        if self._element_numbers is None:
+            self._element_numbers = dict((id(element), n) for (n, element) in enumerate(self.elements))
+        try:
+            return [self._element_numbers[id(element)] for element in path]
+        except KeyError:
+            raise ValueError("path is not through the graph of this transition table")
+
+    @property
+    def trie(self):
+        """
+        The ``ReconstructionTrie`` shared by every reconstruction through this graph.
+        """
+        if self._trie is None:
+            self._trie = ReconstructionTrie(self, max_trie_nodes)
+        return self._trie
+
+    def to_path(self, element_numbers):
+        """
+        Give the edges and vertices numbered by ``element_numbers``.
+        """
+        elements = self.elements
+        return [elements[n] for n in element_numbers]
+
+
+class _TrieNode(object):
+    __slots__ = ["parent", "vertex", "segment", "children"]
+
+    def __init__(self, parent, vertex, segment):
+        self.parent = parent
+        self.vertex = vertex
+        self.segment = segment
+        self.children = {}
+
+
+class ReconstructionTrie(object):
+    """
+    Reconstructs paths through the graph of ``table``, remembering the vertex reached after each prefix of the condition
+    sequences seen so far.  Each path then resumes from the longest prefix it shares with an earlier path, so
+    shared prefixes are only traversed once.
+
+    At most ``max_nodes`` prefixes are remembered, if given.
+    """
+
+    def __init__(self, table, max_nodes=None):
+        self._table = table
+        self._root = _TrieNode(None, 0, [])
+        self._max_nodes = max_nodes
+        self.nodes = 1
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "<%s nodes=%i, hits=%i, misses=%i>" % (self.__class__.__name__, self.nodes, self.hits, self.misses)
+
+    def reconstruct(self, path_subchain, instrumentation_point_path_length, path=None):
+        """
+        Reconstruct a program execution path, as in ``TransitionTable.reconstruct``.
+        If ``path`` is given, the numbers of the elements of the path are added to it rather than to a new list.
+        """
+        table = self._table
+        node = self._root
+        depth = 0
+        for condition in path_subchain:
+            try:
+                child = node.children.get(condition)
+            except TypeError:
+                # conditions that can't be used as keys are never remembered
+                child = None
+            if child is None:
+                break
+            node = child
+            depth += 1
+        self.hits += depth
+        self.misses += len(path_subchain) - depth
+        # gather the path up to the longest remembered prefix
+        segments = []
+        ancestor = node
+        while ancestor is not None:
+            segments.append(ancestor.segment)
+            ancestor = ancestor.parent
+        if path is None:
+            path = []
+        for segment in reversed(segments):
+            path.extend(segment)
+        curr = node.vertex
+        remembering = True
+        for condition in path_subchain[depth:]:
+            segment = []
+            curr = table._consume(curr, condition, segment.append)
+            path.extend(segment)
+            if remembering and (self._max_nodes is None or self.nodes < self._max_nodes):
+                child = _TrieNode(node, curr, segment)
+                try:
+                    node.children[condition] = child
+                    node = child
+                    self.nodes += 1
+                except TypeError:
+                    remembering = False
+            else:
+                remembering = False
+        table._finish(curr, len(path_subchain) > 0, instrumentation_point_path_length, path.append)
+        return path
+
+
+def transition_table(scfg):
+    """
+    Give the transition table of the Symbolic Control-Flow Graph ``scfg``, compiling it only the first time
+    it's needed.
+    """
+    with _tables_lock:
+        table = _tables.get(scfg)
+    if table is None:
+        table = TransitionTable(scfg)
+        with _tables_lock:
+            _tables[scfg] = table
+    return table
+
+
+def edges_from_condition_sequence(scfg, path_subchain, instrumentation_point_path_length):
+    """
+    Given a Symbolic Control-Flow Graph ``scfg``, a path subchain and a path length, reconstruct a program execution
+    path as a sequence of edges from a Symbolic Control-Flow Graph.
+    """
+    table = transition_table(scfg)
+    return table.to_path(table.trie.reconstruct(path_subchain, instrumentation_point_path_length))
+
+
+def _start_worker(scfg):
+    global _worker_table
+    _worker_table = transition_table(scfg)
+
+
+def _reconstruct_in_worker(job):
+    (path_subchain, instrumentation_point_path_length, run_length) = job
+    if run_length:
+        builder = _RunLengthBuilder(_worker_table)
+        _worker_table.trie.reconstruct(path_subchain, instrumentation_point_path_length, builder)
+        return builder.tokens()
+    return _array_bytes(array("I", _worker_table.trie.reconstruct(path_subchain, instrumentation_point_path_length)))
+
+
+def _reconstruct(table, path_subchain, instrumentation_point_path_length, encoded, run_length):
+    if run_length:
+        builder = _RunLengthBuilder(table)
+        table.trie.reconstruct(path_subchain, instrumentation_point_path_length, builder)
+        return RunLengthPath(builder.tokens(), table)
+    element_numbers = table.trie.reconstruct(path_subchain, instrumentation_point_path_length)
+    return EncodedPath(element_numbers, table) if encoded else table.to_path(element_numbers)
+
+
+def paths_from_condition_sequences(scfg, path_subchains, instrumentation_point_path_length, processes=None,
+                                   encoded=False, run_length=False):
+    """
+    Given a Symbolic Control-Flow Graph ``scfg``, a list of path subchains and a path length, reconstruct
+    the program execution path of every path subchain as in ``edges_from_condition_sequence``, giving the paths
+    in the same order.
+
+    If ``processes`` is greater than 1, or ``processes`` is None and ``set_reconstruction_processes`` has been
+    given a number greater than 1, paths are reconstructed by that many worker processes.  Each worker
+    receives the graph once, when it starts, and sends back the numbers of the edges in each path.
+
+    If ``encoded`` is True, the paths are given as ``EncodedPath`` objects rather than lists of edges, and
+    if ``run_length`` is True, they are given as ``RunLengthPath`` objects, built as the paths are reconstructed.
+    """
+    table = transition_table(scfg)
+    if processes is None:
+        processes = get_reconstruction_processes()
+    jobs = [(path_subchain, instrumentation_point_path_length, run_length) for path_subchain in path_subchains]
+    if processes is None or processes <= 1 or len(jobs) < 2:
+        return [_reconstruct(table, path_subchain, instrumentation_point_path_length, encoded, run_length)
+                for path_subchain in path_subchains]
+    # send subchains sharing prefixes to the same worker, so its trie can share their traversal
+    order = sorted(range(len(jobs)), key=lambda n: [str(condition) for condition in jobs[n][0]])
+    processes = min(processes, len(jobs))
+    pool = multiprocessing.Pool(processes, initializer=_start_worker, initargs=(scfg,))
+    try:
+        results = pool.map(
+            _reconstruct_in_worker,
+            [jobs[n] for n in order],
+            max(1, len(jobs) // (processes * 4))
+        )
+    finally:
+        pool.terminate()
+    paths = [None] * len(jobs)
+    for (n, data) in zip(order, results):
+        if run_length:
+            paths[n] = RunLengthPath(data, table)
+            continue
+        element_numbers = _array_from_bytes(data)
+        paths[n] = EncodedPath(element_numbers, table) if encoded else table.to_path(element_numbers)
+    return paths
+
+
+# conditions that are sent as they are, rather than pickled
+_plain_conditions = frozenset(
+    ["loop-jump", "conditional exited", "try-catch exited", "try-catch-main", "parameter", "exit conditional"]
+)
+
+default_condition_cache_size = 10000
+
+# marks conditions that aren't in the cache, since a condition can be None
+_missing = object()
+
+
+class ConditionCache(object):
+    """
+    A bounded, least-recently-used cache of deserialised conditions, keyed by their serialised form.
+
+    Every occurrence of a serialised condition is given the same deserialised object, so the objects
+    must not be modified.
+    """
 
-    #path.append(curr)
+    def __init__(self, max_size=default_condition_cache_size):
+        self._max_size = max_size
+        self._conditions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
-    return path
+    def __repr__(self):
+        return "<%s size=%i, hits=%i, misses=%i, evictions=%i>" % \
+               (
+                   self.__class__.__name__,
+                   len(self._conditions),
+                   self.hits,
+                   self.misses,
+                   self.evictions
+               )
+
+    def get(self, serialised_condition):
+        """
+        Give the deserialised form of ``serialised_condition``, unpickling it only if it isn't already held.
+        """
+        with self._lock:
+            condition = self._conditions.get(serialised_condition, _missing)
+            if condition is not _missing:
+                # move the condition to the most recently used end
+                del self._conditions[serialised_condition]
+                self._conditions[serialised_condition] = condition
+                self.hits += 1
+                return condition
+            self.misses += 1
+        condition = pickle.loads(serialised_condition)
+        with self._lock:
+            self._conditions[serialised_condition] = condition
+            while len(self._conditions) > self._max_size:
+                self._conditions.popitem(last=False)
+                self.evictions += 1
+        return condition
+
+    def stats(self):
+        """Give the hit and miss counters of the cache as a dictionary."""
+        with self._lock:
+            return {"size": len(self._conditions), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
+
+    def clear(self):
+        """Remove every condition held and reset the counters."""
+        with self._lock:
+            self._conditions.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+condition_cache = ConditionCache()
 
 
 def deserialise_condition(serialised_condition):
-    if serialised_condition != "":
-        if not(serialised_condition in ["loop-jump", "conditional exited", "try-catch exited", "try-catch-main", "parameter", "exit conditional"]):
-            #print(serialised_condition)
-            unserialised_condition = pickle.loads(serialised_condition)
-        else:
-            unserialised_condition = serialised_condition
-    else:
-        unserialised_condition = None
-    return unserialised_condition
+    """
+    Give the condition serialised as ``serialised_condition``.  Pickled conditions are held in ``condition_cache``,
+    so each distinct condition is only unpickled once.
+    """
+    if serialised_condition == "":
+        return None
+    if serialised_condition in _plain_conditions:
+        return serialised_condition
+    return condition_cache.get(serialised_condition)
@@ -0,0 +1,160 @@
+"""
+Module for caching responses from the verdict server.
+"""
+from collections import OrderedDict
+import threading
+import sqlite3
+import atexit
+import time
+import json
+import re
+
+# the time to live, in seconds, of responses to each class of end-point.  The first pattern matching an end-point
+# is used.  A time to live of None means the response never expires, and 0 means it is never cached.
+default_ttls = [
+    # server control end-points
+    (r"^$|^shutdown/$", 0),
+    # rows looked up by their ID or hash never change once they are written
+    (r"^client/[a-z_]+/(id|hash)/[^/]+/$", None),
+    (r"^client/path_condition_structure/function_call/\d+/$", None),
+    (r"^client/get_path_condition_sequence/\d+/$", None),
+    # anything else, such as the list of calls of a function, can grow while the monitored service is running
+    (r".*", 60),
+]
+
+default_max_size = 10000
+
+# the time to live, in seconds, of a function call looked up by its ID that hasn't finished, since its end time
+# is written once it finishes
+default_unfinished_call_ttl = 60
+
+_function_call_by_id = re.compile(r"^client/function_call/id/\d+/$")
+
+
+def _is_unfinished_call(end_point, body):
+    # decide whether ``body`` is the row of a function call that hasn't finished yet
+    if not _function_call_by_id.match(end_point):
+        return False
+    try:
+        row = json.loads(body)
+    except ValueError:
+        return False
+    return isinstance(row, dict) and row.get("end_time_of_call") is None
+
+
+class ResponseCache(object):
+    """
+    A bounded, least-recently-used cache of responses from the verdict server, with a time to live for each class
+    of end-point.
+
+    If ``disk_cache_file`` is given, responses that never expire are also kept in an SQLite file, so later
+    scripts and notebook sessions can reuse them without contacting the server.
+
+    A function call looked up by its ID that hasn't finished yet expires after ``unfinished_call_ttl`` seconds,
+    since its end time is written once it finishes.
+    """
+
+    def __init__(self, max_size=default_max_size, ttls=None, disk_cache_file=None,
+                 unfinished_call_ttl=default_unfinished_call_ttl):
+        self._max_size = max_size
+        self._unfinished_call_ttl = unfinished_call_ttl
+        self._ttls = [(re.compile(pattern), ttl) for (pattern, ttl) in (ttls if ttls is not None else default_ttls)]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._disk = None
+        self._pending_disk_writes = 0
+        if disk_cache_file is not None:
+            self._disk = sqlite3.connect(disk_cache_file, check_same_thread=False)
+            self._disk.execute("create table if not exists response (key text primary key, body text not null)")
+            self._disk.commit()
+            atexit.register(self.flush)
+
+    def __repr__(self):
+        return "<%s size=%i, hits=%i, disk_hits=%i, misses=%i, evictions=%i>" % \
+               (
+                   self.__class__.__name__,
+                   len(self._entries),
+                   self.hits,
+                   self.disk_hits,
+                   self.misses,
+                   self.evictions
+               )
+
+    def ttl(self, end_point):
+        """Give the time to live of responses to ``end_point``."""
+        for (pattern, ttl) in self._ttls:
+            if pattern.match(end_point):
+                return ttl
+        return 0
+
+    def get(self, key, end_point):
+        """
+        Give the cached response for ``end_point`` under ``key``, or None if there is no live cached response.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                (body, expires_at) = entry
+                if expires_at is None or expires_at > time.time():
+                    # move the entry to the most recently used end
+                    del self._entries[key]
+                    self._entries[key] = entry
+                    self.hits += 1
+                    return body
+                del self._entries[key]
+            if self._disk is not None and self.ttl(end_point) is None:
+                row = self._disk.execute("select body from response where key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._store(key, row[0], None)
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, end_point, body):
+        """Cache ``body`` as the response for ``end_point`` under ``key``, if that class of end-point is cached."""
+        ttl = self.ttl(end_point)
+        # don't cache missing rows, since they may be written later
+        if ttl == 0 or body == "None":
+            return
+        if ttl is None and _is_unfinished_call(end_point, body):
+            ttl = self._unfinished_call_ttl
+        with self._lock:
+            self._store(key, body, None if ttl is None else time.time() + ttl)
+            if self._disk is not None and ttl is None:
+                self._disk.execute("insert or replace into response (key, body) values (?, ?)", (key, body))
+                self._pending_disk_writes += 1
+                if self._pending_disk_writes >= 100:
+                    self._disk.commit()
+                    self._pending_disk_writes = 0
+
+    def _store(self, key, body, expires_at):
+        if key in self._entries:
+            del self._entries[key]
+        self._entries[key] = (body, expires_at)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """Give the hit and miss counters of the cache as a dictionary."""
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "disk_hits": self.disk_hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+    def clear(self):
+        """Remove every response held in memory and reset the counters.  The disk tier is left as it is."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def flush(self):
+        """Write any pending responses to the disk tier."""
+        with self._lock:
+            if self._disk is not None and self._pending_disk_writes > 0:
+                self._disk.commit()
+                self._pending_disk_writes = 0
@@ -0,0 +1,161 @@
+"""
+Module for caching Symbolic Control-Flow Graphs, so each is only built once for each version of its source file,
+and the parsed source files they are built from.
+"""
+import threading
+import hashlib
+import pickle
+import ast
+import os
+import re
+
+# changed whenever the way graphs are built or stored changes, so that graphs cached before are not used
+cache_format = 1
+
+# graphs are stored on disk in files with names of this form, so that other files in the same directory are left alone
+disk_file_prefix = "vypr-scfg-"
+_disk_file_pattern = re.compile(r"^%s[0-9a-f]{40}\.pickle(\.\d+\.tmp)?$" % re.escape(disk_file_prefix))
+
+
+class ModuleCache(object):
+    """
+    A cache of the source code and abstract syntax trees of the instrumented files of the monitored service,
+    so that each version of a file is only read and parsed once, however many of its functions are analysed.
+
+    A file is read again whenever its modification time or size changes.
+    """
+
+    def __init__(self):
+        self._modules = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, file_name):
+        file_name = os.path.abspath(file_name)
+        status = os.stat(file_name)
+        version = (status.st_mtime, status.st_size)
+        with self._lock:
+            entry = self._modules.get(file_name)
+        if entry is None or entry["version"] != version:
+            with open(file_name, "rb") as f:
+                source = f.read()
+            entry = {"version": version, "fingerprint": hashlib.sha1(source).hexdigest(), "source": source,
+                     "asts": None}
+            with self._lock:
+                self._modules[file_name] = entry
+        return entry
+
+    def fingerprint(self, file_name):
+        """Give a hash of the contents of the file ``file_name``."""
+        return self._entry(file_name)["fingerprint"]
+
+    def source(self, file_name):
+        """Give the contents of the file ``file_name``."""
+        return self._entry(file_name)["source"]
+
+    def asts(self, file_name):
+        """Give the abstract syntax tree of the module in the file ``file_name``."""
+        entry = self._entry(file_name)
+        if entry["asts"] is None:
+            entry["asts"] = ast.parse(entry["source"])
+        return entry["asts"]
+
+    def clear(self):
+        """Remove every file held in the cache."""
+        with self._lock:
+            self._modules.clear()
+
+
+module_cache = ModuleCache()
+
+
+class SCFGCache(object):
+    """
+    A cache of Symbolic Control-Flow Graphs, each stored under a key identifying its function along with
+    the fingerprint of the source file it was built from.  A graph is only given for the fingerprint it was stored
+    with, so graphs are rebuilt automatically once their source file changes.
+
+    If ``directory`` is given, graphs are also pickled to files in that directory, so later scripts and notebook
+    sessions don't need to build them again.  The names of those files start with ``disk_file_prefix``, and no other
+    files in the directory are touched.
+    """
+
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._graphs = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __repr__(self):
+        return "<%s size=%i, hits=%i, disk_hits=%i, misses=%i>" % \
+               (
+                   self.__class__.__name__,
+                   len(self._graphs),
+                   self.hits,
+                   self.disk_hits,
+                   self.misses
+               )
+
+    def _disk_file(self, key, fingerprint):
+        name = hashlib.sha1(("%s|%s|%i" % (key, fingerprint, cache_format)).encode("utf-8")).hexdigest()
+        return os.path.join(self._directory, "%s%s.pickle" % (disk_file_prefix, name))
+
+    def get(self, key, fingerprint):
+        """Give the graph stored under ``key`` for ``fingerprint``, or None if there isn't one."""
+        with self._lock:
+            entry = self._graphs.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                self.hits += 1
+                return entry[1]
+        if self._directory is not None:
+            disk_file = self._disk_file(key, fingerprint)
+            if os.path.isfile(disk_file):
+                try:
+                    with open(disk_file, "rb") as f:
+                        scfg = pickle.load(f)
+                except Exception:
+                    # a file that can't be read is replaced when the graph is built again
+                    scfg = None
+                if scfg is not None:
+                    with self._lock:
+                        self._graphs[key] = (fingerprint, scfg)
+                        self.disk_hits += 1
+                    return scfg
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, fingerprint, scfg):
+        """Store ``scfg`` under ``key`` for ``fingerprint``, replacing any graph built from an older version."""
+        with self._lock:
+            self._graphs[key] = (fingerprint, scfg)
+        if self._directory is not None:
+            disk_file = self._disk_file(key, fingerprint)
+            # write to a temporary file first, so other processes never read a partly written graph
+            temporary_file = "%s.%i.tmp" % (disk_file, os.getpid())
+            try:
+                with open(temporary_file, "wb") as f:
+                    pickle.dump(scfg, f, pickle.HIGHEST_PROTOCOL)
+                os.rename(temporary_file, disk_file)
+            except Exception:
+                # graphs that can't be pickled, for example because they are too deeply nested, are only kept in memory
+                if os.path.exists(temporary_file):
+                    os.remove(temporary_file)
+
+    def stats(self):
+        """Give the hit and miss counters of the cache as a dictionary."""
+        with self._lock:
+            return {"size": len(self._graphs), "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+    def clear(self):
+        """Remove every graph held in memory or stored on disk by the cache, and reset the counters."""
+        with self._lock:
+            self._graphs.clear()
+            self.hits = self.disk_hits = self.misses = 0
+            if self._directory is not None:
+                for name in os.listdir(self._directory):
+                    if _disk_file_pattern.match(name):
+                        os.remove(os.path.join(self._directory, name))
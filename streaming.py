@@ -0,0 +1,106 @@
+"""
+Module for streaming long lists of rows with bounded memory.
+Rows are decoded as they arrive, and read in pages by a background thread so the next page is ready
+while the caller is processing the current one.
+"""
+import itertools
+import threading
+import json
+try:
+    from queue import Queue, Full
+except ImportError:
+    from Queue import Queue, Full
+
+# number of rows handed from the background thread to the caller at once
+default_page_size = 1000
+
+# the characters that can separate the elements of a JSON array
+_separators = " \t\r\n,"
+
+
+def iter_json_array(chunks):
+    """
+    Given an iterable of pieces of text that together form a JSON array, give a generator over the elements
+    of the array.  Each element is decoded as soon as it has been received in full, so the whole array
+    is never held in memory at once.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    in_array = False
+    for chunk in itertools.chain(chunks, [None]):
+        exhausted = chunk is None
+        if not exhausted:
+            buffer = buffer[position:] + chunk
+            position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in _separators:
+                position += 1
+            if position == len(buffer):
+                break
+            if not in_array:
+                if buffer[position] != "[": raise ValueError("expected a JSON array")
+                in_array = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                (element, end) = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if exhausted: raise
+                break
+            # an element at the very end of the buffer, such as a number, might continue in the next chunk
+            if end == len(buffer) and not exhausted:
+                break
+            yield element
+            position = end
+    raise ValueError("incomplete JSON array")
+
+
+def _put(queue, item, stopped):
+    # give up if the caller stops reading, rather than waiting forever for space on the queue
+    while not stopped.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            pass
+    return False
+
+
+def prefetch_pages(rows, page_size=default_page_size, pages_ahead=1):
+    """
+    Give a generator over ``rows`` that reads them in pages of ``page_size`` rows in a background thread,
+    keeping up to ``pages_ahead`` pages ready while the caller processes the current one.
+
+    Any exception raised while reading ``rows`` is raised again in the caller.
+    """
+    pages = Queue(maxsize=pages_ahead)
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            page = []
+            for row in rows:
+                page.append(row)
+                if len(page) == page_size:
+                    if not _put(pages, (page, None), stopped): return
+                    page = []
+            if page and not _put(pages, (page, None), stopped): return
+            _put(pages, (None, None), stopped)
+        except Exception as e:
+            _put(pages, (None, e), stopped)
+
+    producer = threading.Thread(target=produce)
+    producer.daemon = True
+    producer.start()
+    try:
+        while True:
+            (page, error) = pages.get()
+            if error is not None: raise error
+            if page is None: return
+            for row in page:
+                yield row
+    finally:
+        stopped.set()
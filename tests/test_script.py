@@ -20,6 +20,10 @@ from testmodules.test_instrumentation_point_methods import *
 from testmodules.test_transaction_methods import *
 from testmodules.test_atom_methods import *
 from testmodules.test_observation_methods import *
+from testmodules.test_database_connection import *
+from testmodules.test_query import *
+from testmodules.test_path_reconstruction import *
+from testmodules.test_response_cache import *
 
 
 
@@ -0,0 +1,128 @@
+"""
+Path reconstruction as it was done before transition tables were introduced, kept so that the tests can check
+that reconstruction still gives the same paths.
+"""
+
+
+def edges_from_condition_sequence(scfg, path_subchain, instrumentation_point_path_length):
+    """
+    Given a Symbolic Control-Flow Graph ``scfg``, a path subchain and a path length, reconstruct a program execution
+    path as a sequence of edges from a Symbolic Control-Flow Graph.
+    """
+    condition_index = 0
+    curr = scfg.starting_vertices
+    path = []
+    cumulative_conditions = []
+    while condition_index < len(path_subchain):
+        if len(curr.edges) > 1:
+            # more than 1 outgoing edges means we have a branching point
+
+            #TODO: need to handle parameters in condition sequences
+            if path_subchain[condition_index] == "parameter":
+                if curr._name_changed == ["conditional"]:
+                    # add the vertex to the path, skip past the construct
+                    # and increment the condition index
+                    path.append(curr)
+                    curr = curr.post_conditional_vertex
+                    condition_index += 1
+                    continue
+
+            # we have to decide whether it's a loop or a conditional
+            if curr._name_changed == ["conditional"]:
+                # path_subchain[condition_index] is the index of the branch to follow if we're dealing with a conditional
+                path.append(curr.edges[int(path_subchain[condition_index])])
+                curr = curr.edges[int(path_subchain[condition_index])]._target_state
+                condition_index += 1
+            elif curr._name_changed == ["loop"]:
+                if path_subchain[condition_index] == "enter-loop":
+                    # condition isn't a negation, so follow the edge leading into the loop
+                    for edge in curr.edges:
+                        if edge._condition == ["enter-loop"]:
+                            cumulative_conditions.append("for")
+                            # follow this edge
+                            curr = edge._target_state
+                            path.append(edge)
+                            break
+                    # make sure the next branching point consumes the next condition in the chain
+                    condition_index += 1
+                else:
+                    # go straight past the loop
+                    for edge in curr.edges:
+                        if edge._condition == ["end-loop"]:
+                            cumulative_conditions.append(edge._condition)
+                            # follow this edge
+                            curr = edge._target_state
+                            path.append(edge)
+                            break
+                    # make sure the next branching point consumes the next condition in the chain
+                    condition_index += 1
+            elif curr._name_changed == ["try-catch"]:
+                # for now assume that we immediately traverse the no-exception branch
+                # search the outgoing edges for the edge leading to the main body
+                for edge in curr.edges:
+                    if edge._condition[-1] == "try-catch-main":
+                        curr = edge._target_state
+                        path.append(edge)
+                        cumulative_conditions.append(edge._condition[-1])
+                        break
+                condition_index += 1
+            else:
+                # probably the branching point at the end of a loop - currently these aren't explicitly marked
+                # the behaviour here with respect to consuming branching conditions will be a bit different
+                if path_subchain[condition_index] == "enter-loop":
+                    # go back to the start of the loop without consuming the condition
+                    relevant_edge = list(filter(lambda edge : edge._condition == 'loop-jump', curr.edges))[0]
+                    curr = relevant_edge._target_state
+                    path.append(relevant_edge)
+                else:
+                    # go past the loop
+                    relevant_edge = list(filter(lambda edge : edge._condition == 'post-loop', curr.edges))[0]
+                    curr = relevant_edge._target_state
+                    path.append(relevant_edge)
+                    # consume the negative condition
+                    condition_index += 1
+
+        elif curr._name_changed == ["post-conditional"]:
+            # check the next vertex - if it's also a post-conditional, we move to that one but don't consume the condition
+            # if the next vertex isn't a post-conditional, we consume the condition and move to it
+            if curr.edges[0]._target_state._name_changed != ["post-conditional"]:
+                # consume the condition
+                condition_index += 1
+            path.append(curr.edges[0])
+            curr = curr.edges[0]._target_state
+        elif curr._name_changed == ["post-loop"]:
+            # condition is consumed when branching at the end of the loop is detected, so no need to do it here
+            path.append(curr.edges[0])
+            curr = curr.edges[0]._target_state
+        elif curr._name_changed == ["post-try-catch"]:
+            if len(curr.edges) > 0 and curr.edges[0]._target_state._name_changed != ["post-try-catch"]:
+                # consume the condition
+                condition_index += 1
+                path.append(curr.edges[0])
+                curr = curr.edges[0]._target_state
+            elif len(curr.edges) == 0:
+                # consume the condition
+                condition_index += 1
+        else:
+            path.append(curr.edges[0])
+            curr = curr.edges[0]._target_state
+
+
+    # traverse the remainder of the branch using the path length of the instrumentation point
+    # that generated the observation we're looking at
+    if instrumentation_point_path_length != -1:
+        # the length here needs to be changed depending on what the most recent construct the graph encountered was
+        # or we need to move the vertex back one in the case that it advanced "too far".
+        offset = -1 if curr._path_length == 1 else 0
+        limit = (instrumentation_point_path_length + offset) if len(path_subchain) > 0 else instrumentation_point_path_length
+        for i in range(limit):
+            path.append(curr.edges[0])
+            curr = curr.edges[0]._target_state
+    else:
+        # we're reconstructing a complete path through the SCFG, so go until we get to a final state
+        while len(curr.edges) > 0:
+            path.append(curr.edges[0])
+            curr = curr.edges[0]._target_state
+
+
+    return path
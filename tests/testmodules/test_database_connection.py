@@ -0,0 +1,56 @@
+import unittest
+import pickle
+import VyPRAnalysis as va
+
+class test_database_connection(unittest.TestCase):
+
+    def setUp(self):
+        va.set_database("verdicts.db", create_indices=False)
+
+    def tearDown(self):
+        va.set_server("http://localhost:9001/")
+
+    def test_lookups(self):
+        self.assertEqual(len(va.list_functions()), 3)
+        self.assertEqual(va.function(1).fully_qualified_name, 'server-app.routes.find_new_hashes')
+        with self.assertRaises(ValueError): va.function(4)
+        self.assertEqual(len(va.function(3).get_calls()), 3910)
+        self.assertEqual(len(va.function_call(6).get_verdicts(binding=3)), 1)
+        self.assertEqual(len(va.binding(3).get_verdicts()), 3941)
+        self.assertEqual(len(va.instrumentation_point(1).get_observations()), 4000)
+
+    def test_bulk_lookups(self):
+        self.assertEqual([obs.id for obs in va.observations([3, 1, 2])], [3, 1, 2])
+        with self.assertRaises(ValueError): va.verdicts([1, 9000])
+
+    def test_query(self):
+        self.assertEqual(len(va.query(va.Verdict).filter(verdict=0).limit(10).all()), 10)
+        self.assertEqual(len(va.query(va.Verdict).filter(function_call=6, binding=3).all()), 1)
+        self.assertEqual(va.query(va.Verdict).filter(binding=3).count(), 3941)
+        self.assertEqual(va.query(va.FunctionCall).filter(function=2).group_by("day").count()[0]["count"], 4000)
+
+    def test_server_only_end_points(self):
+        with self.assertRaises(NotImplementedError): va.get_parametric_path([1], 1)
+        with self.assertRaises(NotImplementedError): va.observation(1).reconstruct_reaching_path(None)
+
+    def test_frames(self):
+        for binding_id in [1, 2, 3]:
+            frame = va.binding(binding_id).get_verdict_frame()
+            ratio = va.query(va.Verdict).filter(binding=binding_id).failure_ratio()
+            self.assertEqual(len(frame), ratio["count"])
+            self.assertAlmostEqual(frame.failure_rate(), ratio["failure_ratio"])
+        self.assertEqual(str(frame.time_obtained.dtype), "datetime64[us]")
+        self.assertEqual(str(frame.time_obtained[0]), va.verdict(int(frame.id[0])).time_obtained)
+        observations = va.instrumentation_point(1).get_observation_frame()
+        self.assertEqual(len(observations), 4000)
+        self.assertEqual(str(observations.observation_time.dtype), "datetime64[us]")
+
+    def test_pickling(self):
+        objects = [va.function_call(6), va.verdict(3), va.observation(1), va.Verdict(4, lazy=True),
+                   va.Assignment(1, "x", "1", "int")]
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            for obj in objects:
+                copy = pickle.loads(pickle.dumps(obj, protocol))
+                self.assertIs(type(copy), type(obj))
+                fields = [name for name in obj.__slots__ if name not in ("_related", "__weakref__")]
+                self.assertEqual([getattr(copy, name) for name in fields], [getattr(obj, name) for name in fields])
@@ -7,6 +7,11 @@ class test_function_call_methods(parent_setup):
         self.assertIsInstance(va.function_call(1), va.FunctionCall)
         with self.assertRaises(ValueError): va.function_call(11911)
 
+    def test_bulk_init(self):
+        self.assertEqual([call.id for call in va.function_calls([12, 6])], [12, 6])
+        self.assertIsInstance(va.function_calls([1, 2])[0], va.FunctionCall)
+        with self.assertRaises(ValueError): va.function_calls([1, 11911])
+
     def test_get_verdicts(self):
         self.assertEqual(len(va.function_call(12).get_verdicts()), 2)
         self.assertIsInstance(va.function_call(12).get_verdicts()[0], va.Verdict)
@@ -31,6 +36,14 @@ class test_function_call_methods(parent_setup):
         self.assertEqual(va.function_call(6).get_verdicts(binding=1), [])
         with self.assertRaises(ValueError): va.function_call(6).get_verdicts(binding="wrong_type")
 
+    def test_get_verdicts_include(self):
+        call = va.function_call(12)
+        verdicts = call.get_verdicts(include=["observations"])
+        self.assertEqual(len(verdicts), 2)
+        self.assertEqual([v.id for v in call.get_verdicts()], [v.id for v in verdicts])
+        self.assertEqual(len(verdicts[0].get_observations()), len(va.verdict(verdicts[0].id).get_observations()))
+        with self.assertRaises(ValueError): call.get_verdicts(include=["wrong_relation"])
+
     def test_get_observations(self):
         self.assertEqual(len(va.function_call(2).get_observations()),1)
         self.assertIsInstance(va.function_call(2).get_observations()[0], va.Observation)
@@ -1,6 +1,7 @@
 import unittest
 import VyPRAnalysis as va
 import VyPR
+from VyPR.SCFG.parse_tree import ParseTree
 import os
 
 class test_function_methods(unittest.TestCase):
@@ -33,6 +34,8 @@ class test_function_methods(unittest.TestCase):
         self.assertEqual(va.function(3).fully_qualified_name, 'server-app.metadata_handler.MetadataHandler:__init__')
 
         with self.assertRaises(ValueError): va.function(4)
+        self.assertIs(va.function(1), va.function(1))
+        self.assertIs(va.function(1), va.function(fully_qualified_name='server-app.routes.find_new_hashes')[0])
         self.assertEqual(len(va.function(fully_qualified_name='wrong_name')), 0)
 
     def test_get_calls(self):
@@ -48,8 +51,53 @@ class test_function_methods(unittest.TestCase):
 
         self.assertEqual(len(va.Function(4, "fake_name").get_calls()), 0)
 
+    def test_iter_calls(self):
+        calls = va.function(1).get_calls()
+        self.assertEqual([call.id for call in va.function(1).iter_calls(page_size=100)], [call.id for call in calls])
+        self.assertEqual(len(list(va.function(1).iter_calls(prefetch=False))), 4000)
+
     def test_get_scfg(self):
         self.assertIsInstance(va.function(3).get_scfg(), VyPR.SCFG.construction.CFG)
+        self.assertIs(va.function(3).get_scfg(), va.function(3).get_scfg())
+
+    def test_grammar_of(self):
+        from VyPRAnalysis.orm.operations import _grammar_of
+        scfg = va.function(3).get_scfg()
+        grammar = _grammar_of(scfg)
+        self.assertIs(_grammar_of(scfg), grammar)
+        # every intersection of paths through the graph shares its grammar
+        self.assertIs(va.PathIntersection(scfg)._grammar, grammar)
+
+    def test_build_scfgs(self):
+        scfgs = va.build_scfgs([va.function(3), va.function(2), va.function(3)], processes=2)
+        self.assertEqual(len(scfgs), 3)
+        self.assertIsInstance(scfgs[1], VyPR.SCFG.construction.CFG)
+        self.assertIs(scfgs[0], scfgs[2])
+        self.assertIs(scfgs[0], va.function(3).get_scfg())
+
+    def test_profile_paths(self):
+        profile = va.profile_paths(va.function(3))
+        report = profile.report(percentiles=[50])
+        self.assertEqual(sum(entry["count"] for entry in report), len(va.function(3).get_calls()))
+        self.assertEqual(sorted([entry["count"] for entry in report], reverse=True), [entry["count"] for entry in report])
+        self.assertLessEqual(report[0]["min"], report[0]["p50"])
+        # nothing new to add
+        self.assertEqual(len(profile.update().report()), len(report))
+
+    def test_path_intersection(self):
+        scfg = va.function(3).get_scfg()
+        paths = [entry["path"] for entry in va.profile_paths(va.function(3)).report()]
+        self.assertGreaterEqual(len(paths), 3)
+        # repeated paths given one at a time intersect to the same tree as every path intersected at once
+        intersection = va.PathIntersection(scfg)
+        intersection.add_all(iter(paths + paths))
+        self.assertEqual(intersection.paths, 2 * len(paths))
+        grammar = scfg.derive_grammar()
+        parse_trees = [ParseTree(list(path), grammar, scfg.starting_vertices) for path in paths + paths]
+        self.assertEqual(list(map(str, intersection.tree().read_leaves())),
+                         list(map(str, parse_trees[0].intersect(parse_trees[1:]).read_leaves())))
+        collection = va.PathCollection(iter(paths + paths), scfg, va.function(3).fully_qualified_name, distinct=True)
+        self.assertEqual(collection.get_counts(), [2] * len(paths))
 
     def test_get_bindings(self):
         self.assertEqual(len(va.function(1).get_bindings()), 0)
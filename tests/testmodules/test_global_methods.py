@@ -1,5 +1,6 @@
 from . import parent_setup
 import VyPRAnalysis as va
+import threading
 
 class test_global_methods(parent_setup):
 
@@ -7,4 +8,34 @@ class test_global_methods(parent_setup):
         self.assertEqual(len(va.list_functions()), 3)
         for i in range(2):
             self.assertIsInstance(va.list_functions()[i], va.Function)
+
+    def test_fetch_concurrently(self):
+        ids = lambda lists: [[obj.id for obj in objects] for objects in lists]
+        functions = va.list_functions()
+        self.assertEqual(ids(va.get_calls_concurrently(functions)), ids([f.get_calls() for f in functions]))
+        calls = va.function(1).get_calls()[:20]
+        self.assertEqual(ids(va.get_verdicts_concurrently(calls)), ids([call.get_verdicts() for call in calls]))
+        self.assertEqual(ids(va.get_verdicts_concurrently(calls, value=0)),
+                         ids([call.get_verdicts(value=0) for call in calls]))
+        verdicts = va.verdicts(list(range(1, 21)))
+        self.assertEqual(ids(va.get_observations_concurrently(verdicts)),
+                         ids([v.get_observations() for v in verdicts]))
+        observations = va.observations(list(range(1, 21)))
+        self.assertEqual(ids(va.get_assignments_concurrently(observations)),
+                         ids([obs.get_assignments() for obs in observations]))
+        self.assertEqual([v.id for v in va.fetch_concurrently(va.verdict, list(range(20, 0, -1)))],
+                         list(range(20, 0, -1)))
+
+    def test_nested_map(self):
+        # a map inside a worker thread runs in that thread, rather than waiting on the pool it is part of
+        connection = va.VerdictServerConnection("http://localhost:9001/", max_concurrency=2)
+        main_thread = threading.current_thread()
+        def outer(n):
+            thread = threading.current_thread()
+            inner = connection.map(lambda m: threading.current_thread() is thread, range(3))
+            return (thread is not main_thread, inner)
+        try:
+            self.assertEqual(connection.map(outer, range(8)), [(True, [True, True, True])] * 8)
+        finally:
+            connection.close()
     #def test_list_test_data(self):
@@ -6,6 +6,10 @@ class test_observation_methods(parent_setup):
     def test_init(self):
         with self.assertRaises(ValueError): va.observation(13091)
         self.assertIsInstance(va.observation(1), va.Observation)
+    def test_bulk_init(self):
+        self.assertEqual([obs.id for obs in va.observations([3, 1, 2])], [3, 1, 2])
+        self.assertIsInstance(va.observations([1, 2])[1], va.Observation)
+        with self.assertRaises(ValueError): va.observations([1, 13091])
     def test_get_assignments(self):
         self.assertEqual(va.observation(1).get_assignments(), [])
     def test_get_instrumentation_point(self):
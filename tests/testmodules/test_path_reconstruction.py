@@ -0,0 +1,154 @@
+from . import parent_setup
+from . import baseline_reconstruction
+import VyPRAnalysis as va
+import pickle
+from VyPRAnalysis.path_reconstruction import (edges_from_condition_sequence,
+                                              paths_from_condition_sequences,
+                                              transition_table,
+                                              ReconstructionTrie,
+                                              EncodedPath,
+                                              ConditionCache,
+                                              deserialise_condition)
+
+
+def condition_sequences(function_id, limit=500):
+    # the path condition sequences of some of the calls of a function
+    calls = va.query(va.FunctionCall).filter(function=function_id).limit(limit).all()
+    conditions = va.get_connection().fetch_many(
+        ['client/path_condition_structure/function_call/%i/' % call.id for call in calls]
+    )
+    return [condition_list or [] for condition_list in conditions]
+
+
+class test_path_reconstruction(parent_setup):
+
+    def test_transition_table(self):
+        scfg = va.function(3).get_scfg()
+        table = transition_table(scfg)
+        sequences = condition_sequences(3)
+        self.assertGreater(len(sequences), 0)
+        for sequence in sequences:
+            expected = baseline_reconstruction.edges_from_condition_sequence(scfg, sequence, -1)
+            self.assertEqual(table.to_path(table.reconstruct(sequence, -1)), expected)
+            self.assertEqual(edges_from_condition_sequence(scfg, sequence, -1), expected)
+
+    def test_reconstruction_trie(self):
+        scfg = va.function(3).get_scfg()
+        table = transition_table(scfg)
+        # distinct sequences along with their first halves, so that sequences share prefixes and then diverge
+        sequences = []
+        for sequence in condition_sequences(3):
+            for prefix in (sequence[:len(sequence) // 2], sequence):
+                if prefix not in sequences:
+                    sequences.append(prefix)
+        expected = [baseline_reconstruction.edges_from_condition_sequence(scfg, sequence, -1)
+                    for sequence in sequences]
+        self.assertEqual(paths_from_condition_sequences(scfg, sequences, -1, processes=1), expected)
+        self.assertEqual([edges_from_condition_sequence(scfg, sequence, -1) for sequence in sequences], expected)
+        for max_nodes in (None, 2):
+            trie = ReconstructionTrie(table, max_nodes)
+            self.assertEqual([table.to_path(trie.reconstruct(sequence, -1)) for sequence in sequences], expected)
+            self.assertGreater(trie.hits, 0)
+            if max_nodes is not None:
+                self.assertLessEqual(trie.nodes, max_nodes)
+
+    def test_run_length_paths(self):
+        # find_new_hashes iterates a loop over the hashes it is given
+        scfg = va.function(1).get_scfg()
+        table = transition_table(scfg)
+        sequences = condition_sequences(1)
+        paths = paths_from_condition_sequences(scfg, sequences, -1, processes=1)
+        run_length_paths = paths_from_condition_sequences(scfg, sequences, -1, processes=1, run_length=True)
+        for (path, run_length_path) in zip(paths, run_length_paths):
+            self.assertEqual(run_length_path.expand().decode(), path)
+            self.assertEqual(run_length_path, path)
+            self.assertEqual(table.run_length(path), run_length_path)
+            self.assertEqual(len(run_length_path), len(path))
+            self.assertEqual([run_length_path[n] for n in range(len(path))], path)
+            if path:
+                self.assertIs(run_length_path[-1], path[-1])
+        # the same path counts once, whichever form it is given in
+        multiset = va.PathMultiset(scfg, va.function(1).fully_qualified_name)
+        for path in (paths[0], table.encode(paths[0]), table.run_length(paths[0])):
+            multiset.add(path)
+        self.assertEqual(len(multiset), 1)
+        self.assertEqual(multiset.count(paths[0]), 3)
+
+    def test_reconstruction_processes(self):
+        scfg = va.function(3).get_scfg()
+        sequences = condition_sequences(3)
+        serial = paths_from_condition_sequences(scfg, sequences, -1, processes=1)
+        # pooled reconstruction gives the same paths, in the order of the subchains given
+        self.assertEqual(paths_from_condition_sequences(scfg, sequences, -1, processes=2), serial)
+        self.assertEqual(paths_from_condition_sequences(scfg, sequences, -1, processes=2, encoded=True), serial)
+        self.assertEqual(paths_from_condition_sequences(scfg, sequences, -1, processes=2, run_length=True), serial)
+        # a single subchain is reconstructed without a pool
+        self.assertEqual(paths_from_condition_sequences(scfg, sequences[:1], -1, processes=2), serial[:1])
+        # the number of processes set for the library is used when none is given
+        va.set_reconstruction_processes(2)
+        try:
+            self.assertEqual(paths_from_condition_sequences(scfg, sequences, -1), serial)
+        finally:
+            va.set_reconstruction_processes(None)
+        self.assertEqual(paths_from_condition_sequences(scfg, sequences, -1), serial)
+
+    def test_encoded_paths(self):
+        scfg = va.function(3).get_scfg()
+        function_name = va.function(3).fully_qualified_name
+        table = transition_table(scfg)
+        paths = paths_from_condition_sequences(scfg, condition_sequences(3), -1, processes=1)
+        path = max(paths, key=len)
+        self.assertGreater(len(path), 1)
+        encoded = table.encode(path)
+        # encoded paths equal the edges they encode, and other encodings of them
+        self.assertEqual(encoded, path)
+        self.assertEqual(list(encoded), path)
+        self.assertEqual(encoded.decode(), path)
+        self.assertEqual(encoded, table.encode(list(path)))
+        self.assertEqual(hash(encoded), hash(table.encode(list(path))))
+        self.assertNotEqual(encoded, path[:-1])
+        self.assertIs(encoded[0], path[0])
+        self.assertIs(encoded[-1], path[-1])
+        # slices are encoded paths through the same graph
+        half = encoded[:len(path) // 2]
+        self.assertIsInstance(half, EncodedPath)
+        self.assertEqual(half, path[:len(path) // 2])
+        self.assertTrue(encoded.startswith(half))
+        self.assertFalse(half.startswith(encoded))
+        # only the numbers are pickled, so an unpickled path needs its table again before its edges are used
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            unpickled = pickle.loads(pickle.dumps(encoded, protocol))
+            self.assertEqual(unpickled, encoded)
+            self.assertEqual(hash(unpickled), hash(encoded))
+            with self.assertRaises(ValueError): unpickled[0]
+            self.assertEqual(unpickled.bind(table).decode(), path)
+        # differences and multisets of encoded paths
+        difference = va.PathCollection([encoded], scfg, function_name) - va.PathCollection([half], scfg, function_name)
+        self.assertEqual(difference._paths, [path[len(path) // 2:]])
+        multiset = va.PathMultiset(scfg, function_name)
+        for other_path in paths:
+            multiset.add(table.encode(other_path))
+        self.assertEqual(multiset.count(path), paths.count(path))
+        self.assertEqual(multiset.total, len(paths))
+
+    def test_condition_cache(self):
+        cache = ConditionCache(max_size=2)
+        (a, b, c) = [pickle.dumps(condition) for condition in (["a"], ["b"], ["c"])]
+        first = cache.get(a)
+        self.assertEqual(first, ["a"])
+        # repeated strings give the identical object
+        self.assertIs(cache.get(a), first)
+        cache.get(b)
+        # a becomes the most recently used, so b is evicted when c is added
+        self.assertIs(cache.get(a), first)
+        cache.get(c)
+        self.assertEqual(cache.stats(), {"size": 2, "hits": 2, "misses": 3, "evictions": 1})
+        self.assertIs(cache.get(a), first)
+        self.assertEqual(cache.get(b), ["b"])
+        self.assertEqual(cache.stats(), {"size": 2, "hits": 3, "misses": 4, "evictions": 2})
+        cache.clear()
+        self.assertEqual(cache.stats(), {"size": 0, "hits": 0, "misses": 0, "evictions": 0})
+        # conditions that aren't pickled are given as they are
+        self.assertIs(deserialise_condition(a), deserialise_condition(a))
+        self.assertEqual(deserialise_condition("loop-jump"), "loop-jump")
+        self.assertIsNone(deserialise_condition(""))
@@ -0,0 +1,32 @@
+from . import parent_setup
+import VyPRAnalysis as va
+
+class test_query(parent_setup):
+
+    def test_filter(self):
+        self.assertEqual(len(va.query(va.Verdict).filter(binding=3).all()), 3941)
+        self.assertEqual(len(va.query(va.Verdict).filter(function_call=6, binding=3).all()), 1)
+        self.assertEqual(va.query(va.Verdict).filter(function_call=6, binding=va.binding(3)).first().binding, 3)
+        self.assertEqual(len(va.query(va.Observation).filter(function_call=2).all()), 1)
+        calls = va.query(va.FunctionCall).filter(function=1, id__gt=2, id__le=5).all()
+        self.assertEqual([call.id for call in calls], [c.id for c in va.function(1).get_calls() if 2 < c.id <= 5])
+        self.assertEqual([row["id"] for row in va.query(va.FunctionCall).filter(function=1, id__gt=2, id__le=5).rows()],
+                         [call.id for call in calls])
+        with self.assertRaises(ValueError): va.query(va.Verdict).filter(wrong_field=1)
+        with self.assertRaises(ValueError): va.query(va.Verdict).filter(binding__between=1)
+        with self.assertRaises(ValueError): va.query(va.Verdict).filter(verdict=0).all()
+
+    def test_order_and_limit(self):
+        calls = va.query(va.FunctionCall).filter(function=1).order_by("-id").limit(3).all()
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(calls[0].id > calls[1].id > calls[2].id)
+
+    def test_aggregates(self):
+        self.assertEqual(va.query(va.Verdict).filter(binding=3).count(), 3941)
+        self.assertEqual(va.query(va.Verdict).filter(binding=3).failure_ratio()["failure_ratio"], 1.0)
+        by_binding = va.query(va.Verdict).filter(function_call=6).group_by("binding").count()
+        self.assertEqual([group["binding"] for group in by_binding], [2, 3])
+        stats = va.query(va.Observation).filter(instrumentation_point=1).observed_value_stats(percentiles=(50,))
+        self.assertEqual(stats["count"], 4000)
+        self.assertTrue(stats["min"] <= stats["p50"] <= stats["max"])
+        with self.assertRaises(ValueError): va.query(va.Observation).failure_ratio()
@@ -0,0 +1,114 @@
+from . import parent_setup
+import VyPRAnalysis as va
+from VyPRAnalysis.http_requests import VerdictServerConnection
+from VyPRAnalysis.response_cache import ResponseCache
+import os
+import tempfile
+import time
+
+
+class StubResponse(object):
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+
+class StubSession(object):
+    """Stands in for the HTTP session of a connection, responding with ``status_code`` and counting requests."""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.requests = 0
+
+    def get(self, url, **kwargs):
+        self.requests += 1
+        return StubResponse(self.status_code, '{"id": %i}' % self.requests)
+
+    def close(self):
+        pass
+
+
+class test_response_cache(parent_setup):
+
+    def test_ttl(self):
+        cache = ResponseCache(ttls=[(r"^short/$", 0.1), (r"^never/$", 0), (r".*", None)])
+        cache.put("short", "short/", "1")
+        self.assertEqual(cache.get("short", "short/"), "1")
+        time.sleep(0.2)
+        self.assertIsNone(cache.get("short", "short/"))
+        cache.put("never", "never/", "2")
+        self.assertIsNone(cache.get("never", "never/"))
+        cache.put("kept", "kept/", "3")
+        self.assertEqual(cache.get("kept", "kept/"), "3")
+        # missing rows may be written later, so they are never cached
+        cache.put("missing", "kept/", "None")
+        self.assertIsNone(cache.get("missing", "kept/"))
+        default = ResponseCache()
+        self.assertEqual(default.ttl(""), 0)
+        self.assertEqual(default.ttl("shutdown/"), 0)
+        self.assertIsNone(default.ttl("client/verdict/id/1/"))
+        self.assertEqual(default.ttl("client/function/id/1/function_calls/"), 60)
+
+    def test_unfinished_calls(self):
+        cache = ResponseCache(unfinished_call_ttl=0.1)
+        cache.put("finished", "client/function_call/id/1/",
+                  '{"id": 1, "end_time_of_call": "2020-02-25T13:54:22.526559"}')
+        cache.put("unfinished", "client/function_call/id/2/", '{"id": 2, "end_time_of_call": null}')
+        time.sleep(0.2)
+        self.assertIsNotNone(cache.get("finished", "client/function_call/id/1/"))
+        self.assertIsNone(cache.get("unfinished", "client/function_call/id/2/"))
+
+    def test_lru_bound(self):
+        cache = ResponseCache(max_size=2, ttls=[(r".*", None)])
+        cache.put("a", "a/", "1")
+        cache.put("b", "b/", "2")
+        # a becomes the most recently used, so b is evicted when c is added
+        cache.get("a", "a/")
+        cache.put("c", "c/", "3")
+        self.assertIsNone(cache.get("b", "b/"))
+        self.assertEqual(cache.get("a", "a/"), "1")
+        self.assertEqual(cache.get("c", "c/"), "3")
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_disk_tier(self):
+        (handle, disk_cache_file) = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        try:
+            ttls = [(r"^kept/$", None), (r".*", 60)]
+            cache = ResponseCache(ttls=ttls, disk_cache_file=disk_cache_file)
+            cache.put("kept", "kept/", "1")
+            cache.put("expiring", "expiring/", "2")
+            cache.flush()
+            # a later session finds responses that never expire on disk, and then holds them in memory
+            later = ResponseCache(ttls=ttls, disk_cache_file=disk_cache_file)
+            self.assertEqual(later.get("kept", "kept/"), "1")
+            self.assertEqual(later.stats()["disk_hits"], 1)
+            self.assertEqual(later.get("kept", "kept/"), "1")
+            self.assertEqual(later.stats()["hits"], 1)
+            self.assertIsNone(later.get("expiring", "expiring/"))
+        finally:
+            os.remove(disk_cache_file)
+
+    def test_only_successful_responses(self):
+        connection = VerdictServerConnection("http://localhost:9001/", cache=ResponseCache())
+        connection._session = StubSession(500)
+        connection.request("client/verdict/id/1/")
+        connection.request("client/verdict/id/1/")
+        self.assertEqual(connection._session.requests, 2)
+        connection._session.status_code = 200
+        first = connection.request("client/verdict/id/1/")
+        self.assertEqual(connection.request("client/verdict/id/1/"), first)
+        self.assertEqual(connection._session.requests, 3)
+        connection.close()
+
+    def test_cleared_on_connection_change(self):
+        cache = va.get_response_cache()
+        va.function(1)
+        self.assertGreater(cache.stats()["size"], 0)
+        va.set_server("http://localhost:9001/")
+        self.assertEqual(cache.stats()["size"], 0)
+        va.function(1)
+        self.assertGreater(cache.stats()["size"], 0)
+        va.set_database("verdicts.db")
+        self.assertEqual(cache.stats()["size"], 0)
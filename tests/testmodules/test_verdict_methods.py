@@ -10,6 +10,20 @@ class test_verdict_methods(parent_setup):
         with self.assertRaises(ValueError): va.verdict(9000)
         with self.assertRaises(Exception): va.verdict(verdict = 0)
 
+    def test_bulk_init(self):
+        self.assertEqual([v.id for v in va.verdicts([2, 1])], [2, 1])
+        self.assertIsInstance(va.verdicts([1, 2])[0], va.Verdict)
+        with self.assertRaises(ValueError): va.verdicts([1, 9000])
+
+    def test_lazy_init(self):
+        v = va.Verdict(3, lazy=True)
+        # the fields are only loaded once one of them is first used
+        with self.assertRaises(AttributeError): object.__getattribute__(v, "verdict")
+        self.assertEqual(v.verdict, 0)
+        self.assertEqual(object.__getattribute__(v, "binding"), 1)
+        self.assertEqual(v.function_call, 5)
+        with self.assertRaises(ValueError): va.Verdict(9001, lazy=True).binding
+
     def test_get_observations(self):
         self.assertEqual(len(va.verdict(1).get_observations()),1)
         self.assertIsInstance(va.verdict(1).get_observations()[0], va.Observation)